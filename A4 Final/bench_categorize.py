@@ -0,0 +1,59 @@
+# BENCHMARK: per-row categorize_uncached() vs categorize_batch()
+#
+# Builds a fake bank export of merchant descriptions, categorizes it both
+# ways, checks the answers match and prints the timings.
+#
+#     python bench_categorize.py            # 20,000 rows
+#     python bench_categorize.py 200000     # bigger upload
+
+import random
+import sys
+import time
+
+from categorizer import categorize_uncached, categorize_batch, category_cache_info, invalidate_category_cache
+
+MERCHANTS = [
+    "STARBUCKS #1234", "UBER TRIP", "WALMART SUPERCENTER", "NETFLIX.COM",
+    "SHELL GAS STATION", "CITY WATER DEPT", "COMCAST INTERNET", "LYFT RIDE",
+    "BLUE CAFE", "AMC MOVIE THEATER", "SAFEWAY GROCERY", "AMAZON MKTP",
+    "HAWAIIAN ELECTRIC", "RENT PAYMENT", "TARGET T-1845", "PANDA EXPRESS",
+    "HULU", "THE BUS", "APPLE.COM/BILL", "LOCAL RESTAURANT",
+]
+
+
+def make_descriptions(n, seed=352):
+    rng = random.Random(seed)
+    # statements repeat the same merchant strings (a few store numbers each)
+    return [f"{rng.choice(MERCHANTS)} {rng.randint(1, 50)}" for _ in range(n)]
+
+
+def time_it(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    descriptions = make_descriptions(n)
+
+    per_row, per_row_secs = time_it(lambda: [categorize_uncached(d) for d in descriptions])
+    batch, batch_secs = time_it(lambda: categorize_batch(descriptions, use_cache=False))
+
+    invalidate_category_cache()
+    cached, cached_secs = time_it(lambda: categorize_batch(descriptions))
+    cache = category_cache_info()
+
+    print(f"rows:        {n:,}")
+    print(f"per-row:     {per_row_secs:8.3f}s  ({n / per_row_secs:,.0f} rows/s)")
+    print(f"batch:       {batch_secs:8.3f}s  ({n / batch_secs:,.0f} rows/s)")
+    print(f"batch+cache: {cached_secs:8.3f}s  ({n / cached_secs:,.0f} rows/s, hit rate {cache['hit_rate']:.1%})")
+    print(f"speedup:     {per_row_secs / batch_secs:8.1f}x (batch), {per_row_secs / cached_secs:.1f}x (batch+cache)")
+    same = per_row == batch == cached
+    print(f"same result: {same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# BENCHMARK: month/season totals, per-row strptime vs bincount on day numbers
+#
+# Runs the original spending_by_month_and_season loop (csv + strptime per
+# row) and ledger.month_season_totals() over the same ledger, checks every
+# user's totals match exactly (values and season order) and prints the
+# timings.  Uses transactions.csv if it has rows, otherwise a generated one
+# with a few awkward rows mixed in (legacy 3-column rows, missing dates, bad
+# dates and amounts, pre-1970 dates).
+#
+# The baseline loop reads each row's fields the way ledger.py does since the
+# typed-columns change: by field count, not through csv.DictReader.  The old
+# DictReader lined dated 4-field rows up against a 3-column header (as in the
+# repo's sample transactions.csv) and silently dropped them; that was a bug,
+# so the comparison is against the corrected loop.
+#
+#     python bench_dates.py                # 200,000 generated rows
+#     python bench_dates.py 1000000
+#     python bench_dates.py 0 ../transactions.csv
+
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import ledger
+
+USERS = ["alice", "bob", "carol", "dave", "erin"]
+CATEGORIES = ["Groceries", "Entertainment", "Transportation", "Bills", "Food & Dining", "Miscellaneous/Other"]
+ODD_DATES = ["", "2025-02-30", "2025-1-5", "12/24/2025", "1969-12-31", "2024-02-29", "2025-13-01"]
+
+
+def safe_float(x, default=None):
+    try:
+        return float(x)
+    except (ValueError, TypeError):
+        return default
+
+
+def spending_by_month_and_season(path, username):
+    """The original per-row version from final11.py (rows split as in ledger.py)."""
+    month_totals = {m: 0.0 for m in range(1, 13)}
+    season_totals = {}
+
+    with open(path, newline='') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader, None) or ledger.FIELDNAMES
+        for fields in reader:
+            if not fields:
+                continue
+            row_user, date_str, _, amount_str = ledger._split_fields(header, fields)
+            if row_user != username:
+                continue
+            amount = safe_float(amount_str)
+            if amount is None:
+                continue
+            if not date_str:
+                continue
+            try:
+                dt = datetime.strptime(date_str, "%Y-%m-%d")
+            except ValueError:
+                continue
+            m = dt.month
+            month_totals[m] += amount
+            season = ledger.season_for_month(m)
+            season_totals[season] = season_totals.get(season, 0) + amount
+
+    return month_totals, season_totals
+
+
+def make_csv(path, n, seed=352):
+    rng = random.Random(seed)
+    start = date(2022, 1, 1)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(ledger.FIELDNAMES)
+        for i in range(n):
+            user, category = rng.choice(USERS), rng.choice(CATEGORIES)
+            amount = f"{rng.uniform(1, 300):.2f}"
+            if i % 997 == 0:
+                writer.writerow([user, category, amount])  # legacy row
+                continue
+            day = (start + timedelta(days=rng.randrange(4 * 365))).isoformat()
+            if i % 991 == 0:
+                day = rng.choice(ODD_DATES)
+            if i % 983 == 0:
+                amount = rng.choice(["", "abc"])
+            writer.writerow([user, day, category, amount])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    source = sys.argv[2] if len(sys.argv) > 2 else ledger.TRANSACTIONS_FILE
+    use_source = os.path.exists(source) and os.path.getsize(source) > 0
+
+    workdir = tempfile.mkdtemp(prefix='bench-dates-')
+    here = os.getcwd()
+    try:
+        path = os.path.join(workdir, ledger.TRANSACTIONS_FILE)
+        if use_source:
+            shutil.copy(source, path)
+        else:
+            make_csv(path, n)
+        os.chdir(workdir)
+
+        with open(path, newline='') as f:
+            users = sorted({row.get('username') for row in csv.DictReader(f)} - {None})
+
+        start = time.perf_counter()
+        slow = {u: spending_by_month_and_season(path, u) for u in users}
+        slow_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ledger.build_index()
+        index_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast = {u: ledger.month_season_totals(u) for u in users}
+        fast_secs = time.perf_counter() - start
+
+        rows = ledger._count
+        print(f"ledger:      {source if use_source else 'generated'} ({rows:,} rows, {len(users)} users)")
+        print(f"per-row:     {slow_secs:8.3f}s  (csv + strptime, every user)")
+        print(f"index build: {index_secs:8.3f}s  (once, then kept up to date on append)")
+        print(f"bincount:    {fast_secs:8.3f}s  ({slow_secs / fast_secs:,.0f}x)")
+
+        same = all(
+            slow[u][0] == fast[u][0] and list(slow[u][1].items()) == list(fast[u][1].items())
+            for u in users
+        )
+        print(f"same result: {same}")
+        if not same:
+            sys.exit(1)
+    finally:
+        os.chdir(here)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
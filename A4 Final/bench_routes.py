@@ -0,0 +1,228 @@
+# BENCHMARK: latency and throughput of the main routes as the ledger grows
+#
+# For each ledger size, runs the app in a scratch directory with synthetic
+# users and transactions, logs every user in through Flask's test client and
+# drives each route from several threads at once:
+#
+#     /                       dashboard
+#     /add_transaction        POST one transaction
+#     /import_transaction     POST a small bank CSV (the import itself runs
+#                             in the background; we wait for it between routes)
+#     /view_spending_summary
+#     /view_category_charts   POST bar / pie / line in turn
+#
+# and reports p50/p95/p99 latency and requests/second per route.  Results
+# are written as JSON so runs can be compared.
+#
+#     python bench_routes.py                          # 10k rows, 8 threads
+#     python bench_routes.py --rows 10000,1000000 --users 50 --concurrency 16
+#     python bench_routes.py --requests 500 --out results.json
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date
+from io import BytesIO
+
+import numpy as np
+
+import generate_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+ROUTES = ['home', 'add_transaction', 'import_transaction', 'view_spending_summary', 'view_category_charts']
+CATEGORIES = list(generate_data.CATEGORY_PROFILE)
+MERCHANTS = generate_data.MERCHANTS
+IMPORT_ROWS = 50
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the credit tracker routes.')
+    parser.add_argument('--rows', default='10000', help='ledger sizes to test, comma separated (default 10000)')
+    parser.add_argument('--users', type=int, default=20, help='synthetic users (default 20)')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads per route (default 8)')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route (default 200)')
+    parser.add_argument('--routes', default=','.join(ROUTES), help='routes to drive, comma separated')
+    parser.add_argument('--seed', type=int, default=352)
+    parser.add_argument('--out', default='bench_routes.json', help='where to write the JSON results')
+    parser.add_argument('--one', type=int, help=argparse.SUPPRESS)  # internal: run one size, print JSON
+    return parser.parse_args(argv)
+
+
+# -------------------------------
+#   SYNTHETIC DATA (see generate_data.py)
+# -------------------------------
+def write_data(users, rows, seed):
+    """users.json + transactions.csv here; returns the usernames."""
+    records = generate_data.make_users(np.random.default_rng(seed), users, password='pw')
+    for record in records.values():
+        record["credit_limit"] = 1e12  # every benchmark charge should go through
+    with open('users.json', 'w') as f:
+        json.dump(records, f)
+    generate_data.write_transactions('transactions.csv', records, rows, seed)
+    return list(records)
+
+
+def import_csv(rng):
+    lines = ["date,description,amount"]
+    for _ in range(IMPORT_ROWS):
+        lines.append(f"{date.today().isoformat()},{rng.choice(MERCHANTS)} {rng.randint(1, 50)},{rng.uniform(1, 80):.2f}")
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+
+# -------------------------------
+#   DRIVING THE ROUTES
+# -------------------------------
+def make_request(client, route, i, rng):
+    if route == 'home':
+        return client.get('/')
+    if route == 'add_transaction':
+        return client.post('/add_transaction', data={'category': rng.choice(CATEGORIES), 'amount': '1.00'})
+    if route == 'import_transaction':
+        return client.post('/import_transaction',
+                           data={'file': (BytesIO(import_csv(rng)), 'bench.csv')},
+                           headers={'Accept': 'application/json'},
+                           content_type='multipart/form-data')
+    if route == 'view_spending_summary':
+        return client.get('/view_spending_summary')
+    if route == 'view_category_charts':
+        return client.post('/view_category_charts', data={'chart_type': ('bar', 'pie', 'line')[i % 3]})
+    raise ValueError(route)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def drive(clients, route, total, concurrency, seed):
+    """Send `total` requests to one route from `concurrency` threads."""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker(n):
+        rng = random.Random(seed + n)
+        client = clients[n % len(clients)]
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            response = make_request(client, route, i, rng)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    wall = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def wait_for_imports(final11):
+    start = time.perf_counter()
+    while any(not job["done"] for job in list(final11.import_jobs.values())):
+        time.sleep(0.05)
+    return time.perf_counter() - start
+
+
+def run_one(args):
+    """One ledger size, in a scratch directory.  Returns the results dict."""
+    workdir = tempfile.mkdtemp(prefix='bench-routes-')
+    sys.path.insert(0, HERE)
+    os.chdir(workdir)
+    try:
+        names = write_data(args.users, args.one, args.seed)
+
+        start = time.perf_counter()
+        import final11
+        import ledger
+        ledger.refresh_index()
+        startup = time.perf_counter() - start
+
+        clients = []
+        for name in names:
+            client = final11.app.test_client()
+            client.post('/login', data={'username': name, 'password': 'pw'})
+            clients.append(client)
+
+        results = {}
+        for route in [r for r in args.routes.split(',') if r]:
+            results[route] = drive(clients, route, args.requests, args.concurrency, args.seed)
+            if route == 'import_transaction':
+                results[route]["background_drain_seconds"] = round(wait_for_imports(final11), 4)
+
+        return {
+            "ledger_rows": args.one,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "requests_per_route": args.requests,
+            "startup_seconds": round(startup, 4),
+            "routes": results,
+        }
+    finally:
+        os.chdir(HERE)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_table(run):
+    print(f"\nledger rows: {run['ledger_rows']:,}  users: {run['users']}  "
+          f"concurrency: {run['concurrency']}  startup: {run['startup_seconds']:.2f}s")
+    print(f"  {'route':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}  status")
+    for route, r in run["routes"].items():
+        print(f"  {route:<24}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}"
+              f"{r['throughput_rps']:>10.1f}  {r['status_codes']}")
+
+
+def main():
+    args = parse_args()
+    if args.one is not None:
+        print(json.dumps(run_one(args)))
+        return
+
+    # every size runs in its own process: the app loads its state at import
+    runs = []
+    for rows in [int(r) for r in args.rows.split(',') if r]:
+        cmd = [sys.executable, os.path.abspath(__file__), '--one', str(rows),
+               '--users', str(args.users), '--concurrency', str(args.concurrency),
+               '--requests', str(args.requests), '--routes', args.routes, '--seed', str(args.seed)]
+        output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        run = json.loads(output.strip().splitlines()[-1])
+        print_table(run)
+        runs.append(run)
+
+    with open(args.out, 'w') as f:
+        json.dump({"created": time.strftime('%Y-%m-%dT%H:%M:%S'), "python": sys.version.split()[0], "runs": runs}, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
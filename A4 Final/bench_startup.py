@@ -0,0 +1,88 @@
+# BENCHMARK: cold import time of the app, with a budget
+#
+# Imports final11 in a fresh interpreter under `python -X importtime`
+# (several times, in an empty scratch directory so no data gets loaded),
+# takes the median of final11's cumulative import time and exits 1 if it is
+# over the budget.  Also fails if any of the lazily imported heavy modules
+# (matplotlib, rapidfuzz) is imported at boot again, and lists the modules
+# that cost the most so a regression is easy to track down.
+#
+#     python bench_startup.py                     # 5 runs, 500 ms budget
+#     python bench_startup.py --budget-ms 350 --runs 9
+#     python bench_startup.py --top 25
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+APP_MODULE = 'final11'
+LAZY_MODULES = ['matplotlib', 'rapidfuzz']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Check the app\'s cold import time against a budget.')
+    parser.add_argument('--budget-ms', type=float, default=500.0, help='max median import time (default 500)')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time (default 5)')
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list (default 15)')
+    parser.add_argument('--lazy', default=','.join(LAZY_MODULES),
+                        help='modules that must not be imported at boot, comma separated')
+    return parser.parse_args(argv)
+
+
+def import_times(workdir):
+    """{module: (self us, cumulative us)} for one cold `import final11`."""
+    code = f"import sys; sys.path.insert(0, {HERE!r}); import {APP_MODULE}"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=workdir, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    args = parse_args()
+    lazy = [m for m in args.lazy.split(',') if m]
+
+    workdir = tempfile.mkdtemp(prefix='bench-startup-')
+    try:
+        import_times(workdir)  # writes any stale .pyc files; not counted
+        runs = [import_times(workdir) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    totals = [run[APP_MODULE][1] / 1000 for run in runs]
+    median = statistics.median(totals)
+    print(f"import {APP_MODULE}: median {median:.1f} ms over {args.runs} runs "
+          f"(min {min(totals):.1f}, max {max(totals):.1f}), budget {args.budget_ms:.0f} ms")
+
+    # slowest modules by their own time, from the median run
+    run = runs[totals.index(median)] if median in totals else runs[0]
+    print(f"\n  {'self ms':>9}{'cumul ms':>10}  module")
+    for name, (self_us, cumulative_us) in sorted(run.items(), key=lambda kv: -kv[1][0])[:args.top]:
+        print(f"  {self_us / 1000:>9.1f}{cumulative_us / 1000:>10.1f}  {name}")
+
+    eager = sorted({name.split('.')[0] for r in runs for name in r} & set(lazy))
+    failed = False
+    if eager:
+        print(f"\nFAIL: imported at boot but should be lazy: {', '.join(eager)}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"\nFAIL: {median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\nok")
+
+
+if __name__ == "__main__":
+    main()
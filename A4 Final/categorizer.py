@@ -0,0 +1,212 @@
+# TRANSACTION CATEGORIZER FOR THE CREDIT TRACKER (final11.py)
+#
+# categorize() scores one description against every keyword.
+# categorize_batch() does the same for a whole upload at once: one
+# rapidfuzz.process.cdist call scores every description against every
+# keyword (spread over all cores), then the best keyword per row wins.
+#
+# Both go through a bounded LRU cache of normalized description -> category,
+# since statements repeat the same merchant strings over and over.  The cache
+# is dropped whenever CATEGORY_KEYWORDS changes or invalidate_category_cache()
+# is called (e.g. when a user's custom categories change).
+#
+# rapidfuzz is imported on first use, not at import time: only the import
+# routes need it, and the app should boot without paying for it.
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import timed_stage
+
+DEFAULT_CATEGORY = "Miscellaneous/Other"
+MATCH_CUTOFF = 80
+CATEGORY_CACHE_SIZE = 10000
+
+_category_cache = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_cache_keywords = None  # snapshot of CATEGORY_KEYWORDS the cache was built with
+_cache_lock = threading.Lock()
+
+# -------------------------------
+# KEYWORD TO CATEGORY MAPPING (FOR CSV FILE - MENU #2)
+# -------------------------------
+CATEGORY_KEYWORDS = {
+    "Groceries": ["grocery", "walmart", "supermarket", "food"],
+    "Entertainment": ["netflix", "hulu", "movie", "concert"],
+    "Transportation": ["gas", "uber", "lyft", "taxi", "bus", "train"],
+    "Bills": ["electric", "water", "internet", "rent", "bill"],
+    "Food & Dining": ["restaurant", "cafe", "dining", "coffee", "starbucks"],
+    "Miscellaneous/Other": []  # default category if nothing matches
+}
+
+# -------------------------------
+# FUNCTION TO ASSIGN CATEGORY
+# -------------------------------
+def categorize_uncached(description):
+    from rapidfuzz import fuzz  # used for fuzzy matching (lazy, see top)
+
+    description = description.lower()
+    best_score = 0
+    best_category = DEFAULT_CATEGORY
+
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        for keyword in keywords:
+            score = fuzz.partial_ratio(description, keyword)
+            if score > best_score:
+                best_score = score
+                best_category = category
+
+    if best_score >= MATCH_CUTOFF:
+        return best_category
+    else:
+        return DEFAULT_CATEGORY
+
+# -------------------------------
+# DESCRIPTION -> CATEGORY CACHE
+# -------------------------------
+def normalize_description(description):
+    return " ".join(description.lower().split())
+
+
+def _keywords_snapshot():
+    return tuple((category, tuple(words)) for category, words in CATEGORY_KEYWORDS.items())
+
+
+def _clear_cache():
+    _category_cache.clear()
+    _cache_stats["invalidations"] += 1
+
+
+def invalidate_category_cache():
+    """Forget every cached answer (keywords or custom categories changed)."""
+    with _cache_lock:
+        _clear_cache()
+
+
+def _check_keywords():
+    """Drop the cache if CATEGORY_KEYWORDS was edited since it was filled."""
+    global _cache_keywords
+    snapshot = _keywords_snapshot()
+    if snapshot != _cache_keywords:
+        if _cache_keywords is not None:
+            _clear_cache()
+        _cache_keywords = snapshot
+
+
+def _cache_get(key):
+    if key in _category_cache:
+        _category_cache.move_to_end(key)
+        _cache_stats["hits"] += 1
+        return _category_cache[key]
+    _cache_stats["misses"] += 1
+    return None
+
+
+def _cache_put(key, category):
+    _category_cache[key] = category
+    while len(_category_cache) > CATEGORY_CACHE_SIZE:
+        _category_cache.popitem(last=False)  # least recently used
+
+
+def category_cache_info():
+    with _cache_lock:
+        lookups = _cache_stats["hits"] + _cache_stats["misses"]
+        return {
+            "hits": _cache_stats["hits"],
+            "misses": _cache_stats["misses"],
+            "hit_rate": round(_cache_stats["hits"] / lookups, 4) if lookups else None,
+            "invalidations": _cache_stats["invalidations"],
+            "size": len(_category_cache),
+            "max_size": CATEGORY_CACHE_SIZE,
+        }
+
+
+@timed_stage("categorize")
+def categorize(description):
+    """categorize_uncached(), behind the description cache."""
+    key = normalize_description(description)
+    with _cache_lock:
+        _check_keywords()
+        category = _cache_get(key)
+    if category is None:
+        category = categorize_uncached(key)
+        with _cache_lock:
+            _cache_put(key, category)
+    return category
+
+# -------------------------------
+# BATCH CATEGORIZATION (CSV IMPORTS)
+# -------------------------------
+def _flatten_keywords():
+    """Keywords and their categories, in the same order categorize() tries them."""
+    keywords = []
+    owners = []
+    for category, words in CATEGORY_KEYWORDS.items():
+        for keyword in words:
+            keywords.append(keyword)
+            owners.append(category)
+    return keywords, owners
+
+
+@timed_stage("categorize")
+def categorize_batch(descriptions, workers=-1, use_cache=True):
+    """
+    Categorize a list of descriptions in one go.  Gives the same answers as
+    calling categorize() on each one (ties go to the first keyword).
+    Only descriptions missing from the cache are scored, each distinct one
+    once.  workers=-1 uses all cores.
+    """
+    if not use_cache:
+        return _score_batch(descriptions, workers)
+
+    keys = [normalize_description(d) for d in descriptions]
+    results = [None] * len(keys)
+    missing = {}
+    with _cache_lock:
+        _check_keywords()
+        for i, key in enumerate(keys):
+            if key in missing:
+                # repeat within this upload - scored once, counts as a hit
+                missing[key].append(i)
+                _cache_stats["hits"] += 1
+                continue
+            category = _cache_get(key)
+            if category is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                results[i] = category
+
+    if missing:
+        scored = _score_batch(list(missing), workers)
+        with _cache_lock:
+            for (key, rows), category in zip(missing.items(), scored):
+                _cache_put(key, category)
+                for i in rows:
+                    results[i] = category
+    return results
+
+
+def _score_batch(descriptions, workers):
+    from rapidfuzz import fuzz, process
+
+    if not descriptions:
+        return []
+
+    keywords, owners = _flatten_keywords()
+    if not keywords:
+        return [DEFAULT_CATEGORY] * len(descriptions)
+
+    scores = process.cdist(
+        [d.lower() for d in descriptions],
+        keywords,
+        scorer=fuzz.partial_ratio,
+        dtype=np.float64,
+        workers=workers,
+    )
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(descriptions)), best]
+
+    return [owners[k] if score >= MATCH_CUTOFF else DEFAULT_CATEGORY
+            for k, score in zip(best, best_scores)]
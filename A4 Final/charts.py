@@ -0,0 +1,173 @@
+# CHART RENDERING + CACHE FOR THE CREDIT TRACKER (final11.py)
+#
+# Rendered charts are cached per (username, chart_type, data_version).  The
+# data version comes from ledger.data_version() and changes whenever the
+# user's ledger changes, so a repeat view of an unchanged chart skips
+# matplotlib completely.  The cache is a bounded LRU.
+#
+# Figures are built as matplotlib.figure.Figure objects on their own Agg
+# canvas (no pyplot global state), so charts for different users can render
+# at the same time under a threaded server.  Renders run on a bounded pool.
+#
+# matplotlib is imported by the first render, not at import time: it is most
+# of the app's cold-start cost and only the chart route needs it.  To keep
+# the first chart request from paying for it (plus the font cache scan and
+# first-figure setup), start_warm_up() does all of that on a background
+# thread at boot; chart_engine_ready() turns True once it has finished.
+
+import io
+import base64
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import timed_stage
+
+CHART_CACHE_SIZE = 128
+CHART_WORKERS = 4
+
+_chart_cache = OrderedDict()
+_chart_stats = {"hits": 0, "misses": 0}
+_cache_lock = threading.Lock()
+
+_render_pool = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix='chart-render')
+
+_warm_up = {"started": False, "seconds": None, "error": None}
+_warm_up_lock = threading.Lock()
+_ready = threading.Event()
+
+
+# -------------------------------
+#   RENDER A CHART (BASE64 PNG)
+# -------------------------------
+@timed_stage("chart_render")
+def _draw_category_chart(categories, chart_type):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(6, 4))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    labels = list(categories.keys())
+    values = list(categories.values())
+
+    if chart_type == 'bar':
+        ax.bar(labels, values, color='skyblue')
+        ax.set_xlabel('Category')
+        ax.set_ylabel('Amount Spent')
+        ax.set_title('Expenses by Category (Bar Chart)')
+    elif chart_type == 'pie':
+        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=140)
+        ax.set_title('Expenses by Category (Pie Chart)')
+    elif chart_type == 'line':
+        ax.plot(labels, values, marker='o')
+        ax.set_xlabel('Category')
+        ax.set_ylabel('Amount Spent')
+        ax.set_title('Expenses by Category (Line Chart)')
+
+    fig.tight_layout()
+
+    # Convert to base64 for HTML
+    img = io.BytesIO()
+    fig.savefig(img, format='png')
+    return base64.b64encode(img.getvalue()).decode()
+
+
+def submit_category_chart(categories, chart_type):
+    """Queue a render on the chart pool and return its Future."""
+    return _render_pool.submit(_draw_category_chart, dict(categories), chart_type)
+
+
+def render_category_chart(categories, chart_type):
+    return submit_category_chart(categories, chart_type).result()
+
+
+# -------------------------------
+#   WARM-UP AT BOOT
+# -------------------------------
+WARM_UP_SAMPLE = {"Groceries": 120.0, "Bills": 80.0, "Food & Dining": 45.0}
+
+
+def warm_up():
+    """Import matplotlib, load its font cache and draw a throwaway bar, pie and line chart."""
+    started = time.perf_counter()
+    try:
+        from matplotlib import font_manager
+        font_manager.findfont(font_manager.FontProperties())  # loads (or first builds) the font cache
+        for chart_type in ('bar', 'pie', 'line'):
+            _draw_category_chart.__wrapped__(WARM_UP_SAMPLE, chart_type)  # not timed as a real render
+    except Exception as e:
+        # a broken warm-up just means the first real render pays instead
+        _warm_up["error"] = repr(e)
+    finally:
+        _warm_up["seconds"] = round(time.perf_counter() - started, 3)
+        _ready.set()
+
+
+def start_warm_up():
+    """Run warm_up() on a daemon thread (once)."""
+    with _warm_up_lock:
+        if _warm_up["started"]:
+            return
+        _warm_up["started"] = True
+    threading.Thread(target=warm_up, name='chart-warm-up', daemon=True).start()
+
+
+def chart_engine_ready():
+    return _ready.is_set()
+
+
+def warm_up_info():
+    return {"started": _warm_up["started"], "ready": _ready.is_set(),
+            "seconds": _warm_up["seconds"], "error": _warm_up["error"]}
+
+
+# -------------------------------
+#   CACHED CHARTS
+# -------------------------------
+def cached_category_chart(username, chart_type, data_version, categories, period=None):
+    """
+    Return the base64 PNG for this chart, rendering it only if the cache has
+    nothing for this (username, chart_type, data_version, period).  period is
+    whatever identifies the date range the totals cover, e.g. (start, end).
+    """
+    key = (username, chart_type, data_version, period)
+    with _cache_lock:
+        if key in _chart_cache:
+            _chart_cache.move_to_end(key)
+            _chart_stats["hits"] += 1
+            return _chart_cache[key]
+        _chart_stats["misses"] += 1
+
+    chart_image = render_category_chart(categories, chart_type)
+
+    with _cache_lock:
+        _chart_cache[key] = chart_image
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)  # least recently used
+    return chart_image
+
+
+def chart_cache_info():
+    """Hit/miss counters and current size, for sizing CHART_CACHE_SIZE."""
+    with _cache_lock:
+        return _cache_info()
+
+
+def _cache_info():
+    lookups = _chart_stats["hits"] + _chart_stats["misses"]
+    return {
+        "hits": _chart_stats["hits"],
+        "misses": _chart_stats["misses"],
+        "hit_rate": round(_chart_stats["hits"] / lookups, 4) if lookups else None,
+        "size": len(_chart_cache),
+        "max_size": CHART_CACHE_SIZE,
+    }
+
+
+def clear_chart_cache():
+    with _cache_lock:
+        _chart_cache.clear()
+        _chart_stats.update({"hits": 0, "misses": 0})
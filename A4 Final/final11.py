@@ -12,62 +12,84 @@
 # FINAL 10: Add seasonal spending 
 # FINAL 11: User can add their own categories
 
-from flask import Flask, render_template, request, redirect, url_for, make_response, session, flash
-import json
+from flask import Flask, render_template, request, redirect, url_for, make_response, session, flash, g, has_request_context, jsonify
 import csv
-import io
-import base64
-from datetime import datetime
-
-import matplotlib
-matplotlib.use('Agg')  # Fix for macOS runtime error
-import matplotlib.pyplot as plt
-
-from rapidfuzz import fuzz # used for fuzzy matching
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from werkzeug.http import is_resource_modified
 
-def safe_float(x, default=None):
-    try:
-        return float(x)
-    except (ValueError, TypeError):
-        return default
+from categorizer import categorize_batch, category_cache_info, invalidate_category_cache # keyword / fuzzy matching
 
+import ledger # per-user indexed transaction store
+import charts # chart rendering + cache
+import metrics # latency histograms for /metrics
+import profiling # opt-in cProfile of single requests
 
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'
 
-DEFAULT_CATEGORIES = ["Groceries", "Entertainment", "Transportation", "Bills", "Food & Dining", "Miscellaneous/Other"]
-
 # -------------------------------
-# KEYWORD TO CATEGORY MAPPING (FOR CSV FILE - MENU #2)
+#   REQUEST METRICS (see metrics.py)
 # -------------------------------
-CATEGORY_KEYWORDS = {
-    "Groceries": ["grocery", "walmart", "supermarket", "food"],
-    "Entertainment": ["netflix", "hulu", "movie", "concert"],
-    "Transportation": ["gas", "uber", "lyft", "taxi", "bus", "train"],
-    "Bills": ["electric", "water", "internet", "rent", "bill"],
-    "Food & Dining": ["restaurant", "cafe", "dining", "coffee", "starbucks"],
-    "Miscellaneous/Other": []  # default category if nothing matches
-}
+# registered first, so the timing covers every other before_request hook
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.record_request(request.endpoint or 'not_found', request.method, response.status_code,
+                               time.perf_counter() - started, response.calculate_content_length())
+    return response
+
+# Prometheus scrape target.  Set METRICS_TOKEN to require
+# "Authorization: Bearer <token>".
+@app.route('/metrics')
+def prometheus_metrics():
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return make_response('Unauthorized\n', 401)
+    response = make_response(metrics.render())
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
 
 # -------------------------------
-# FUNCTION TO ASSIGN CATEGORY
+#   ON-DEMAND PROFILING (see profiling.py)
 # -------------------------------
-def categorize(description):
-    description = description.lower()
-    best_score = 0
-    best_category = "Miscellaneous/Other"
-
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for keyword in keywords:
-            score = fuzz.partial_ratio(description, keyword)
-            if score > best_score:
-                best_score = score
-                best_category = category
-
-    if best_score >= 80:
-        return best_category
-    else:
-        return "Miscellaneous/Other"
+# PROFILE_REQUESTS=1 plus an admin's "X-Profile: 1" header or ?profile=1
+# runs that one request under cProfile.  Registered after the timer so the
+# profile still covers the remaining before_request hooks (user sync).
+@app.before_request
+def start_request_profile():
+    if profiling.wanted(request, session.get('username')):
+        g.profiler = profiling.start()
+
+@app.after_request
+def save_request_profile(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiling.stop(profiler)
+        profile_id = profiling.save(profiler, request.endpoint or 'not_found',
+                                    time.perf_counter() - g.get('request_started', time.perf_counter()))
+        response.headers['X-Profile-Id'] = profile_id
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    # only still set if the view raised; nothing worth saving, just let go
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiling.stop(profiler)
+
+DEFAULT_CATEGORIES = ["Groceries", "Entertainment", "Transportation", "Bills", "Food & Dining", "Miscellaneous/Other"]
 
 # -------------------------------
 #   ADD EMOJIS TO DASHBOARD
@@ -149,101 +171,179 @@ def tip_for_utilization(utilization):
     return "✅ Keep it up!"
 
 
-def get_top_category(username):
-    totals = {}
-    try:
-        with open('transactions.csv', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row.get('username') != username:
-                    continue
-
-                cat = row.get('category')
-                amt = safe_float(row.get('amount'))
-
-                if not cat or amt is None:
-                    continue
-
-                totals[cat] = totals.get(cat, 0) + amt
-    except FileNotFoundError:
-        return None
-
-    return max(totals, key=totals.get) if totals else None
-
 # -------------------------------
 # MONTHLY + SEASONAL SPENDING HELPERS
 # -------------------------------
 def month_name(month_num):
     return ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"][month_num-1]
 
-def season_for_month(month):
-    # Northern hemisphere seasons
-    if month in (12, 1, 2):
-        return "Winter ❄️"
-    if month in (3, 4, 5):
-        return "Spring 🌸"
-    if month in (6, 7, 8):
-        return "Summer ☀️"
-    return "Fall 🍂"
+# seasons live in ledger.py so the stored aggregates use the same buckets
+season_for_month = ledger.season_for_month
 
-def spending_by_month_and_season(username):
+# -------------------------------
+#   REPORTING PERIODS
+# -------------------------------
+PERIODS = {
+    "all": "All time",
+    "30d": "Last 30 days",
+    "cycle": "This billing cycle",
+}
+
+# day of the month a billing cycle starts on (1-28)
+BILLING_CYCLE_DAY = min(max(int(os.environ.get('BILLING_CYCLE_DAY', 1)), 1), 28)
+
+def period_range(period, today=None):
+    """(start, end) dates for a PERIODS key, inclusive; (None, None) for all time."""
+    today = today or date.today()
+    if period == "30d":
+        return today - timedelta(days=29), today
+    if period == "cycle":
+        start = today.replace(day=BILLING_CYCLE_DAY)
+        if today.day < BILLING_CYCLE_DAY:
+            # cycle started last month
+            start = (start - timedelta(days=BILLING_CYCLE_DAY)).replace(day=BILLING_CYCLE_DAY)
+        return start, today
+    return None, None
+
+def requested_period():
+    """?period=... (or the form field), falling back to all time."""
+    period = request.values.get('period', 'all')
+    return period if period in PERIODS else 'all'
+
+def compute_spending_overview(username, period='all'):
+    """
+    Everything the dashboard, summary and charts need: category, month and
+    season totals plus the best month, best season and top category.  All
+    time is summed from the user's rollup cube; other periods only cover
+    the rows dated in them (found in the ledger's date index).
+    """
+    category_totals = {}
     month_totals = {m: 0.0 for m in range(1, 13)}
     season_totals = {}
+    found = True
+    start, end = period_range(period)
 
     try:
-        with open('transactions.csv', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-
-            for row in reader:
-                if row.get('username') != username:
-                    continue
-
-                amount = safe_float(row.get('amount'))
-                if amount is None:
-                    continue
-
-
-                # Skip older rows that don't have date yet
-                date_str = row.get('date')
-                if not date_str:
-                    continue
-
-                try:
-                    dt = datetime.strptime(date_str, "%Y-%m-%d")
-                except ValueError:
-                    continue
+        if start:
+            category_totals = ledger.category_totals(username, start, end)
+            month_totals, season_totals = ledger.month_season_totals(username, start, end)
+        else:
+            totals = ledger.user_aggregates(username)
+            category_totals = ledger.cube_category_totals(totals)
+            month_totals = ledger.cube_month_totals(totals)
+            season_totals = ledger.cube_season_totals(totals)
+    except FileNotFoundError:
+        found = False
+
+    named = {cat: amt for cat, amt in category_totals.items() if cat}
+
+    return {
+        "found": found,
+        "category_totals": category_totals,
+        "month_totals": month_totals,
+        "season_totals": season_totals,
+        "top_category": max(named, key=named.get) if named else None,
+        "best_month": max(month_totals, key=month_totals.get) if any(month_totals.values()) else None,
+        "best_season": max(season_totals, key=season_totals.get) if season_totals else None,
+    }
+
+def spending_overview(username, period='all'):
+    """compute_spending_overview(), memoized on flask.g for the current request."""
+    if not has_request_context():
+        return compute_spending_overview(username, period)
+
+    cache = g.setdefault('spending_overview', {})
+    if (username, period) not in cache:
+        cache[(username, period)] = compute_spending_overview(username, period)
+    return cache[(username, period)]
+
+def forget_spending_overview(username):
+    """Drop the memoized overview after this request changed the user's ledger."""
+    if has_request_context():
+        cache = g.get('spending_overview', {})
+        for key in [key for key in cache if key[0] == username]:
+            del cache[key]
 
-                m = dt.month
-                month_totals[m] += amount
+def get_top_category(username):
+    return spending_overview(username)["top_category"]
 
-                season = season_for_month(m)
-                season_totals[season] = season_totals.get(season, 0) + amount
+def spending_by_month_and_season(username):
+    overview = spending_overview(username)
+    return (overview["month_totals"], overview["season_totals"],
+            overview["best_month"], overview["best_season"])
 
-    except FileNotFoundError:
-        pass
+# -------------------------------
+#   LOAD USERS FROM JSON FILE
+# -------------------------------
+# users.json snapshot + users.journal of per-user changes (see user_store.py)
+from user_store import load_users, save_user, sync_users, locked_user, USER_FILE, JOURNAL_FILE
 
-    best_month = max(month_totals, key=month_totals.get) if any(month_totals.values()) else None
-    best_season = max(season_totals, key=season_totals.get) if season_totals else None
+users = load_users()
 
-    return month_totals, season_totals, best_month, best_season
+# pick up changes other worker processes saved (cheap stat check)
+@app.before_request
+def sync_user_state():
+    sync_users(users)
 
 # -------------------------------
-#   LOAD USERS FROM JSON FILE
+#   CONDITIONAL GET (ETag / Last-Modified)
 # -------------------------------
-USER_FILE = 'users.json'
+# Per-user pages only change when the user's ledger (data version) or their
+# credit fields do, so the browser can revalidate with If-None-Match /
+# If-Modified-Since and get a 304 before anything is computed or rendered.
+PAGE_USER_FIELDS = ("first_name", "last_name", "credit_limit", "current_balance", "categories")
 
-def load_users():
-    try:
-        with open(USER_FILE, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        return {}
+def page_validators(username, *extra):
+    """(etag, last_modified) for one user's page; `extra` = anything else the page depends on."""
+    user = users[username]
+    parts = (
+        username,
+        ledger.data_version(username),
+        [user.get(field) for field in PAGE_USER_FIELDS],
+        date.today().isoformat(),  # "last 30 days" etc. move at midnight
+        extra,
+    )
+    etag = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
 
-def save_users(users):
-    with open(USER_FILE, 'w') as f:
-        json.dump(users, f)
+    # newest change to the files behind the page (a safe upper bound for this user)
+    mtimes = [date_to_timestamp(date.today())]
+    for path in (ledger.TRANSACTIONS_FILE, USER_FILE, JOURNAL_FILE):
+        try:
+            mtimes.append(os.path.getmtime(path))
+        except OSError:
+            pass
+    return etag, datetime.fromtimestamp(max(mtimes), timezone.utc)
 
-users = load_users()
+def date_to_timestamp(day):
+    return datetime(day.year, day.month, day.day).timestamp()
+
+def cacheable_page():
+    """
+    True if this page may be revalidated: a GET/HEAD with no one-off flash
+    messages or import progress to show.  Check it before rendering, since
+    rendering consumes the flashes.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    return not (session.get('_flashes') or session.get('import_job'))
+
+def not_modified(etag, last_modified):
+    """A 304 response if the browser's copy is still current, else None."""
+    if not cacheable_page():
+        return None
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(make_response('', 304), etag, last_modified)
+
+def with_validators(response, etag, last_modified, cacheable=True):
+    # per-user page: browsers may keep it but must check back every time
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if cacheable:
+        # a page showing one-off content gets no validators, or a later 304
+        # would bring those messages back
+        response.set_etag(etag)
+        response.last_modified = last_modified
+    return response
 
 # -------------------------------
 #           HOME PAGE
@@ -255,6 +355,11 @@ def home():
         username = session['username']
         user = users[username]
 
+        etag, last_modified = page_validators(username, 'home')
+        cached = not_modified(etag, last_modified)
+        if cached:
+            return cached
+
         full_name = f"{user['first_name']} {user['last_name']}"
 
         credit_limit = user["credit_limit"]
@@ -273,9 +378,11 @@ def home():
         month_totals, season_totals, best_month, best_season = spending_by_month_and_season(username)
         best_month_label = month_name(best_month) if best_month else None
 
+        cacheable = cacheable_page()
 
 
-        return render_template(
+
+        return with_validators(make_response(render_template(
             'dashboard.html',
             full_name=full_name,
             credit_limit=credit_limit,
@@ -287,9 +394,9 @@ def home():
             top_category=top_category,
             category_tip=category_tip,
             best_month_label=best_month_label,
-            best_season=best_season
-        
-        )
+            best_season=best_season,
+            import_job=session.get('import_job')
+        )), etag, last_modified, cacheable)
 
     return redirect(url_for('login'))
 
@@ -327,22 +434,25 @@ def register():
         username = request.form['username']
         password = request.form['password']
 
-        if username in users:
-            flash('Username already exists', 'danger')
-        else:
-            users[username] = {
-                "first_name": first_name,
-                "last_name": last_name,
-                "password": password,
-                "credit_limit": None,
-                "current_balance": None,
-                "first_time": True,
-                "categories": DEFAULT_CATEGORIES.copy()
-            }
-
-            save_users(users)
+        # check + create as one step, so two workers can't both take the name
+        with locked_user(users, username):
+            created = username not in users
+            if created:
+                users[username] = {
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "password": password,
+                    "credit_limit": None,
+                    "current_balance": None,
+                    "first_time": True,
+                    "categories": DEFAULT_CATEGORIES.copy()
+                }
+                save_user(users, username)
+
+        if created:
             flash('Account created successfully! Please login.', 'success')
             return redirect(url_for('login'))
+        flash('Username already exists', 'danger')
     return render_template('register.html')
 
 
@@ -355,13 +465,18 @@ def reset_password():
         username = request.form['username']
         new_password = request.form['new_password']
 
-        if username in users:
-            users[username]["password"] = new_password
-            save_users(users)
+        # locked like every other write, or another worker's locked save of
+        # this user could put the old password back
+        with locked_user(users, username):
+            found = username in users
+            if found:
+                users[username]["password"] = new_password
+                save_user(users, username)
+
+        if found:
             flash('Password reset successfully! Please login.', 'success')
             return redirect(url_for('login'))
-        else:
-            flash('Username not found', 'danger')
+        flash('Username not found', 'danger')
     return render_template('reset_password.html')
 
 # -------------------------------
@@ -390,10 +505,11 @@ def setup_credit():
             if current_balance > credit_limit:
                 flash('Current balance cannot exceed credit limit.', 'danger')
             else:
-                users[username]["credit_limit"] = credit_limit
-                users[username]["current_balance"] = current_balance
-                users[username]["first_time"] = False  # <-- first-time setup complete
-                save_users(users)
+                with locked_user(users, username):
+                    users[username]["credit_limit"] = credit_limit
+                    users[username]["current_balance"] = current_balance
+                    users[username]["first_time"] = False  # <-- first-time setup complete
+                    save_user(users, username)
 
                 #flash("Setup complete!", "success")
                 return redirect(url_for('home'))  # now go to dashboard
@@ -427,10 +543,14 @@ def add_transaction():
             
             if new_category:
                 # save new category (avoid duplicates)
-                if new_category.lower() not in [c.lower() for c in categories]:
-                    categories.append(new_category)
-                    user["categories"] = categories
-                    save_users(users)
+                with locked_user(users, username):
+                    # re-read under the lock: another request may have added one
+                    categories = list(user.get("categories", DEFAULT_CATEGORIES))
+                    if new_category.lower() not in [c.lower() for c in categories]:
+                        categories.append(new_category)
+                        user["categories"] = categories
+                        save_user(users, username)
+                        invalidate_category_cache()
                 category = new_category
             else:
                 category = request.form.get("category")
@@ -446,28 +566,19 @@ def add_transaction():
                 flash('Amount must be greater than zero', 'danger')
                 return render_template('add_transaction.html', categories=categories)
        
-            if user['current_balance'] + amount > user['credit_limit']:
-                flash('Transaction exceeds credit limit.', 'danger')
-                return render_template('add_transaction.html', categories=categories)
-            
-            # Update user balance
-            user['current_balance'] += amount
-            save_users(users)
-
-            # Write transaction to CSV
-            with open('transactions.csv', 'a', newline='') as csvfile:
-                fieldnames = ['username', 'date', 'category', 'amount']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            # check + update the balance and write the row as one step
+            with locked_user(users, username):
+                if user['current_balance'] + amount > user['credit_limit']:
+                    flash('Transaction exceeds credit limit.', 'danger')
+                    return render_template('add_transaction.html', categories=categories)
+                
+                # Update user balance
+                user['current_balance'] += amount
+                save_user(users, username)
 
-                if csvfile.tell() == 0:
-                    writer.writeheader()
-
-                writer.writerow({
-                    'username': username,
-                    'date': datetime.now().strftime("%Y-%m-%d"),
-                    'category': category,
-                    'amount': amount
-                })
+                # Write transaction to CSV (and the per-user index)
+                ledger.append_transaction(username, datetime.now().strftime("%Y-%m-%d"), category, amount)
+            forget_spending_overview(username)
 
 
             # Check if user wants to add another transaction
@@ -487,6 +598,226 @@ def add_transaction():
 
 
 
+def log_category_cache(before):
+    """
+    Report the description cache hit rate for one import: logged at info
+    level and returned, so the job status can carry it too.
+    """
+    after = category_cache_info()
+    hits = after["hits"] - before["hits"]
+    misses = after["misses"] - before["misses"]
+    report = {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+        "size": after["size"],
+    }
+    if hits + misses:
+        app.logger.info("category cache: %d hit(s), %d miss(es), hit rate %.1f%% (%d cached)",
+                        hits, misses, 100.0 * hits / (hits + misses), after["size"])
+    return report
+
+
+# -------------------------------
+#   STREAMING CSV IMPORT HELPERS
+# -------------------------------
+# Uploads are read row by row from the saved file and written to the ledger
+# in chunks, so memory stays flat for huge exports.
+IMPORT_CHUNK_SIZE = 5000
+MAX_SKIP_FLASHES = 10  # per-row "skipped" messages shown after an import
+
+# largest upload accepted (bytes); bigger requests get a 413
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_BYTES', 512 * 1024 * 1024))
+
+# Imports run as background jobs on a small pool; the request only saves the
+# upload to a file and returns a job id.
+IMPORT_WORKERS = 2
+MAX_IMPORT_JOBS = 200  # finished jobs kept for the status endpoint
+
+# a job whose status file has not changed for this long (seconds) is taken
+# to have died with its worker process; running jobs save after every chunk,
+# but a queued job can wait behind other imports, so keep this generous
+IMPORT_STALE_SECONDS = float(os.environ.get('IMPORT_STALE_SECONDS', 900))
+
+# Uploads and job status live in IMPORT_DIR, as <job id>.csv / <job id>.json,
+# so whichever worker process a status poll lands on can answer it.
+IMPORT_DIR = os.environ.get('IMPORT_DIR', 'imports')
+
+_import_pool = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix='csv-import')
+
+# job id -> job (progress counters, status, skipped messages), for the jobs
+# this process is running or ran; other processes read the saved copies
+import_jobs = OrderedDict()
+
+def _job_path(job_id, ext='.json'):
+    return os.path.join(IMPORT_DIR, job_id + ext)
+
+def _write_json_file(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def save_import_job(job):
+    """Publish the job's current status for every worker."""
+    _write_json_file(_job_path(job["job_id"]), job)
+
+def load_import_job(job_id):
+    """A saved job status, or None (unknown id, pruned or not a job id at all)."""
+    if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        with open(_job_path(job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _import_job_stale(job_id):
+    """True if the job's status file has not been saved for IMPORT_STALE_SECONDS."""
+    try:
+        return time.time() - os.path.getmtime(_job_path(job_id)) > IMPORT_STALE_SECONDS
+    except OSError:
+        return False
+
+def prune_import_jobs():
+    """Delete the oldest finished job files beyond MAX_IMPORT_JOBS."""
+    try:
+        names = [n for n in os.listdir(IMPORT_DIR) if n.endswith('.json')]
+    except FileNotFoundError:
+        return
+    names.sort(key=lambda n: os.path.getmtime(os.path.join(IMPORT_DIR, n)), reverse=True)
+    for name in names[MAX_IMPORT_JOBS:]:
+        job = load_import_job(name[:-len('.json')])
+        if job and job["done"]:
+            try:
+                os.remove(os.path.join(IMPORT_DIR, name))
+            except FileNotFoundError:
+                pass
+
+def new_import_progress(username):
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "username": username,
+        "status": "queued",
+        "rows_read": 0,
+        "rows_added": 0,
+        "rows_skipped": 0,
+        "skipped": [],
+        "error": None,
+        "done": False
+    }
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    save_import_job(job)
+    prune_import_jobs()
+    import_jobs[job["job_id"]] = job
+    while len(import_jobs) > MAX_IMPORT_JOBS:
+        oldest = next(iter(import_jobs.values()))
+        if not oldest["done"]:
+            break
+        import_jobs.popitem(last=False)
+    return job
+
+def skipped_messages(skipped, rows_skipped):
+    messages = [f"Transaction '{description}' of {amount} exceeds credit limit, skipped."
+                for description, amount in skipped]
+    if rows_skipped > len(skipped):
+        messages.append(f"...and {rows_skipped - len(skipped)} more transaction(s) exceeded the credit limit and were skipped.")
+    return messages
+
+def run_import_job(job, path):
+    """Background worker: import the saved upload at `path`, then delete it."""
+    job["status"] = "running"
+    save_import_job(job)
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            skipped = import_transactions_from(job["username"], f, job)
+        job["skipped"] = skipped_messages(skipped, job["rows_skipped"])
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        app.logger.exception("import job %s failed", job["job_id"])
+    finally:
+        job["done"] = True
+        save_import_job(job)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def _import_chunk(username, chunk, progress, skipped):
+    """Categorize one chunk, apply the credit limit and append it to the ledger."""
+    categories = categorize_batch([description for _, description, _ in chunk])
+    with locked_user(users, username):
+        _apply_import_chunk(username, chunk, categories, progress, skipped)
+    save_import_job(progress)
+
+def _apply_import_chunk(username, chunk, categories, progress, skipped):
+    user = users[username]
+    new_rows = []
+
+    for (row, description, amount), category in zip(chunk, categories):
+        if user['current_balance'] + amount > user['credit_limit']:
+            progress["rows_skipped"] += 1
+            if len(skipped) < MAX_SKIP_FLASHES:
+                skipped.append((description, amount))
+            continue
+
+        date_str = row.get('date') or datetime.now().strftime("%Y-%m-%d")
+
+        user['current_balance'] += amount
+        new_rows.append({
+            'username': username,
+            'date': date_str,
+            'category': category,
+            'amount': amount
+        })
+
+    progress["rows_added"] += ledger.append_transactions(new_rows)
+    # keep the saved balance in step with what is already in the ledger
+    save_user(users, username)
+
+def import_transactions_from(username, text_stream, progress):
+    """
+    Import a bank CSV (date, description, amount) from a text stream.
+    Updates `progress` as it goes and returns the first few skipped
+    (description, amount) pairs.
+    """
+    reader = csv.DictReader(text_stream)
+    chunk = []
+    skipped = []
+    cache_before = category_cache_info()
+
+    for row in reader:
+        progress["rows_read"] += 1
+        description = row.get('description', '')
+        amount = row.get('amount')
+
+        if not description or not amount:
+            continue
+
+        try:
+            amount = float(amount)
+        except ValueError:
+            continue
+
+        chunk.append((row, description, amount))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _import_chunk(username, chunk, progress, skipped)
+            chunk = []
+
+    if chunk:
+        _import_chunk(username, chunk, progress, skipped)
+
+    progress["category_cache"] = log_category_cache(cache_before)
+    return skipped
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    limit_mb = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+    flash(f'File is too large (limit is {limit_mb:,.0f} MB).', 'danger')
+    return redirect(url_for('import_transaction'))
+
 # ---------------------------------------------------
 #   INTERATIVE MENU OPTION #2 (IMPORT TRANSACTION) - UPDATED TO USE KEYWORDS 
 # ---------------------------------------------------
@@ -502,59 +833,58 @@ def import_transaction():
             flash('No file selected.', 'danger')
             return redirect(request.url)
 
+        job = None
         try:
-            file_stream = file.stream.read().decode("utf-8").splitlines()
-            reader = csv.DictReader(file_stream)
-
-            user = users[username]
-            transactions_added = 0
-
-            with open('transactions.csv', 'a', newline='') as csvfile:
-                fieldnames = ['username', 'date', 'category', 'amount']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            # save the upload to disk (streamed) and hand it to a worker
+            job = new_import_progress(username)
+            path = _job_path(job["job_id"], '.csv')
+            file.save(path)
+            _import_pool.submit(run_import_job, job, path)
+            session['import_job'] = job["job_id"]
 
-                if csvfile.tell() == 0:
-                    writer.writeheader()
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify({"job_id": job["job_id"]}), 202
 
-                for row in reader:
-                    description = row.get('description', '')
-                    amount = row.get('amount')
+            flash('Import started. Your charts will open when it finishes.', 'info')
+            return redirect(url_for('home'))
 
-                    if not description or not amount:
-                        continue
+        except Exception as e:
+            if job:
+                job.update(status="failed", error=str(e), done=True)
+                save_import_job(job)
+            flash(f'Error processing file: {str(e)}', 'danger')
+            return redirect(request.url)
 
-                    try:
-                        amount = float(amount)
-                    except ValueError:
-                        continue
+    return render_template('import_transaction.html')
 
-                    category = categorize(description)
 
-                    if user['current_balance'] + amount > user['credit_limit']:
-                        flash(f"Transaction '{description}' of {amount} exceeds credit limit, skipped.", 'warning')
-                        continue
-                    
-                    date_str = row.get('date') or datetime.now().strftime("%Y-%m-%d")
+# Status of one import job (polled by the dashboard)
+@app.route('/import_status/<job_id>')
+def import_status(job_id):
+    username = session.get('username')
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
 
-                    user['current_balance'] += amount
-                    writer.writerow({
-                        'username': username,
-                        'date': date_str,
-                        'category': category,
-                        'amount': amount
-                    })
-                    transactions_added += 1
+    job = load_import_job(job_id)  # saved copy: the job may run in another worker
+    if not job or job["username"] != username:
+        if session.get('import_job') == job_id:
+            session.pop('import_job')
+        return jsonify({"error": "Job not found"}), 404
 
-            save_users(users)
-            flash(f'{transactions_added} transaction(s) imported successfully!', 'success')
-            # Redirect to chart page automatically
-            return redirect(url_for('view_category_charts', chart_type='bar'))
+    if not job["done"] and _import_job_stale(job_id):
+        job.update(status="failed", error="the import stopped (its worker went away)", done=True)
+        save_import_job(job)
 
-        except Exception as e:
-            flash(f'Error processing file: {str(e)}', 'danger')
-            return redirect(request.url)
+    if job["done"] and session.get('import_job') == job_id:
+        session.pop('import_job')  # reported - stop polling
+        for message in job["skipped"]:
+            flash(message, 'warning')
+        if job["status"] == "done":
+            flash(f'{job["rows_added"]} transaction(s) imported successfully!', 'success')
 
-    return render_template('import_transaction.html')
+    status = {k: v for k, v in job.items() if k != "username"}
+    status["charts_url"] = url_for('view_category_charts', chart_type='bar')
+    return jsonify(status)
 
 
 
@@ -567,25 +897,21 @@ def view_spending_summary():
     if not username:
         return redirect(url_for('login'))
     
+    period = requested_period()
+    etag, last_modified = page_validators(username, 'summary', period)
+    cached = not_modified(etag, last_modified)
+    if cached:
+        return cached
+
     summary = {}
     total_spent = 0.0
 
-    try:
-        with open('transactions.csv', newline = '') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['username'] == username:
-                    category = row['category']
-                    amount = safe_float(row.get('amount'))
-                    if amount is None:
-                        continue
-
-
-                    summary[category] = summary.get(category, 0) + amount
-                    total_spent += amount
-    except FileNotFoundError:
+    overview = spending_overview(username, period)
+    if overview["found"]:
+        summary = overview["category_totals"]
+        total_spent = sum(summary.values(), 0.0)
+    else:
         flash('No tranasctions found.', 'info')
-        summary = {}
 
     user = users.get(username)
     credit_limit = user.get('credit_limit')
@@ -607,8 +933,8 @@ def view_spending_summary():
 
     sum_emoji, sum_label = summary_mood(total_spent, credit_limit)
 
-
-    return render_template(
+    cacheable = cacheable_page()
+    return with_validators(make_response(render_template(
     'view_spending_summary.html',
     summary=summary,  # optional to keep
     summary_with_emojis=summary_with_emojis,
@@ -617,12 +943,51 @@ def view_spending_summary():
     current_balance=current_balance,
     utilization=utilization,
     sum_emoji=sum_emoji,
-    sum_label=sum_label
-)
+    sum_label=sum_label,
+    period=period,
+    periods=PERIODS
+)), etag, last_modified, cacheable)
 
 
     #return render_template('view_spending_summary.html')
 
+# ----------------------------------------
+#   TRANSACTION HISTORY (KEYSET PAGINATION)
+# ----------------------------------------
+HISTORY_PAGE_SIZE = 25
+
+def parse_history_key(value):
+    """'<day>_<row>' from a 'next page' link -> (day, row), or None."""
+    try:
+        day, row = value.split('_')
+        return int(day), int(row)
+    except (AttributeError, ValueError):
+        return None
+
+@app.route('/transaction_history')
+def transaction_history():
+    username = session.get('username')
+    if not username:
+        return redirect(url_for('login'))
+
+    category = request.args.get('category') or None
+    before = parse_history_key(request.args.get('before'))
+
+    try:
+        rows, next_key = ledger.history_page(username, before, category, HISTORY_PAGE_SIZE)
+    except FileNotFoundError:
+        rows, next_key = [], None
+
+    return render_template(
+        'transaction_history.html',
+        rows=rows,
+        category=category,
+        categories=users[username].get('categories', []),
+        next_before=f"{next_key[0]}_{next_key[1]}" if next_key else None,
+        first_page=before is None
+    )
+
+
 # ----------------------------------------
 # INTERATIVE MENU OPTION #4 (VIEW CHARTS) - NEED TO FIX
 # ----------------------------------------
@@ -634,53 +999,114 @@ def view_category_charts():
 
     categories = {}
     chart_image = None
+    period = requested_period()
 
-    # Read latest transactions for user
-    try:
-        with open('transactions.csv', newline='') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['username'] == username:
-                    category = row['category']
-                    amount = safe_float(row.get('amount'))
-                    if amount is None:
-                        continue
-
-                    categories[category] = categories.get(category, 0) + amount
-    except FileNotFoundError:
+    # Read latest per-category totals for user
+    overview = spending_overview(username, period)
+    if overview["found"]:
+        categories = overview["category_totals"]
+    else:
         flash('No transactions found.', 'info')
 
     # Get chart type from form submission
     chart_type = request.form.get('chart_type')
 
     if chart_type and categories:
-        plt.figure(figsize=(6, 4))
-        if chart_type == 'bar':
-            plt.bar(categories.keys(), categories.values(), color='skyblue')
-            plt.xlabel('Category')
-            plt.ylabel('Amount Spent')
-            plt.title('Expenses by Category (Bar Chart)')
-        elif chart_type == 'pie':
-            plt.pie(categories.values(), labels=categories.keys(), autopct='%1.1f%%', startangle=140)
-            plt.title('Expenses by Category (Pie Chart)')
-        elif chart_type == 'line':
-            plt.plot(list(categories.keys()), list(categories.values()), marker='o')
-            plt.xlabel('Category')
-            plt.ylabel('Amount Spent')
-            plt.title('Expenses by Category (Line Chart)')
-
-        plt.tight_layout()
-
-        # Convert to base64 for HTML
-        img = io.BytesIO()
-        plt.savefig(img, format='png')
-        img.seek(0)
-        chart_image = base64.b64encode(img.getvalue()).decode()
-        plt.close()
+        chart_image = charts.cached_category_chart(
+            username, chart_type, ledger.data_version(username), categories,
+            period=period_range(period))
 
     return render_template('view_category_charts.html',
                            chart_image=chart_image,
-                           chart_type=chart_type)
+                           chart_type=chart_type,
+                           period=period,
+                           periods=PERIODS)
+
+
+# ----------------------------------------
+# CHART DATA (JSON) FOR CLIENT-SIDE CHARTS
+# ----------------------------------------
+@app.route('/category_chart_data')
+def category_chart_data():
+    username = session.get('username')
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
+
+    period = requested_period()
+    overview = spending_overview(username, period)
+    data = {
+        "categories": [{"category": category, "amount": amount}
+                       for category, amount in overview["category_totals"].items()]
+    }
+
+    # Optional monthly series: /category_chart_data?monthly=1 (same period)
+    if request.args.get('monthly'):
+        start, end = period_range(period)
+        try:
+            if start is None and end is None:
+                cube = ledger.user_aggregates(username)["cube"]
+                by_month = {key: sum(cell.values()) for key, cell in sorted(cube.items()) if key}
+            else:
+                by_month = ledger.year_month_totals(username, start, end)
+        except FileNotFoundError:
+            by_month = {}
+        data["monthly"] = [{"month": key, "amount": amount} for key, amount in by_month.items()]
+
+    return jsonify(data)
+
+
+# Drill-down over the rollup cube: season -> month -> category
+#   /spending_drilldown                      {season: total}
+#   /spending_drilldown?season=Winter%20❄️   {month: total} for its months
+#   /spending_drilldown?month=12             {category: total} for December
+@app.route('/spending_drilldown')
+def spending_drilldown():
+    username = session.get('username')
+    if not username:
+        return jsonify({"error": "Not logged in"}), 401
+
+    season = request.args.get('season') or None
+    month = request.args.get('month', type=int)
+    if season is not None and season not in ledger.SEASONS:
+        return jsonify({"error": "Unknown season"}), 400
+    if month is not None and not 1 <= month <= 12:
+        return jsonify({"error": "Month must be 1-12"}), 400
+
+    try:
+        totals = ledger.user_aggregates(username)
+    except FileNotFoundError:
+        totals = {"cube": {}, "order": [], "version": 0}
+
+    breakdown = ledger.drill_down(totals, season, month)
+    if month is not None:
+        level, rows = "category", [{"category": key, "amount": amount} for key, amount in breakdown.items()]
+    elif season is not None:
+        level, rows = "month", [{"month": key, "name": month_name(key), "amount": amount} for key, amount in breakdown.items()]
+    else:
+        level, rows = "season", [{"season": key, "amount": amount} for key, amount in breakdown.items()]
+    return jsonify({"level": level, "season": season, "month": month, "rows": rows})
+
+
+# Set CHART_WARMUP=1 to load matplotlib and draw throwaway charts on a
+# background thread at boot, so the first real chart request is not the slow one.
+CHART_WARMUP = os.environ.get('CHART_WARMUP') == '1'
+if CHART_WARMUP:
+    charts.start_warm_up()
+
+# Readiness probe: 503 until the chart warm-up has finished (always 200 when
+# warm-up is off).
+@app.route('/ready')
+def ready():
+    is_ready = charts.chart_engine_ready() or not CHART_WARMUP
+    return jsonify(dict(charts.warm_up_info(), ready=is_ready)), 200 if is_ready else 503
+
+
+# Hit/miss counters for the rendered chart cache (used to size CHART_CACHE_SIZE)
+@app.route('/chart_cache_stats')
+def chart_cache_stats():
+    if not session.get('username'):
+        return redirect(url_for('login'))
+    return jsonify(charts.chart_cache_info())
 
 
 # -------------------------------------------------
@@ -702,15 +1128,19 @@ def change_credit_limit():
             # Convert input to float
             new_credit_limit = float(request.form['new_credit_limit'])
             
-            # Get current balance, default to 0
-            current_balance = user.get('current_balance', 0.0)
-            
-            # Ensure new credit limit >= current balance
-            if new_credit_limit < current_balance:
+            with locked_user(users, username):
+                # Get current balance, default to 0
+                current_balance = user.get('current_balance', 0.0)
+                
+                # Ensure new credit limit >= current balance
+                updated = new_credit_limit >= current_balance
+                if updated:
+                    user['credit_limit'] = new_credit_limit
+                    save_user(users, username)
+
+            if not updated:
                 flash(f'New credit limit cannot be less than your current balance of {current_balance:,.2f}.', 'danger')
             else:
-                user['credit_limit'] = new_credit_limit
-                save_users(users)
                 flash(f'Credit limit updated successfully to {new_credit_limit:,.2f}!', 'success')
                 return redirect(url_for('home'))
         except ValueError:
@@ -739,15 +1169,19 @@ def update_balance():
     if request.method == 'POST':
         try:
             payment_amount = float(request.form['payment_amount'])
-            current_balance = user.get('current_balance', 0)
+
+            with locked_user(users, username):
+                current_balance = user.get('current_balance', 0)
+                applied = 0 < payment_amount <= current_balance
+                if applied:
+                    user['current_balance'] -= payment_amount
+                    save_user(users, username)
 
             if payment_amount <= 0:
                 flash('Payment amount must be greater than zero.', 'danger')
-            elif payment_amount > current_balance:
+            elif not applied:
                 flash('Payment cannot exceed current balance.', 'danger')
             else:
-                user['current_balance'] -= payment_amount
-                save_users(users)
                 flash('Payment applied successfully!', 'success')
                 return redirect(url_for('home'))
 
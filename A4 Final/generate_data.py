@@ -0,0 +1,238 @@
+# SYNTHETIC DATA FOR THE CREDIT TRACKER (final11.py)
+#
+# Writes users.json and transactions.csv in the app's exact format, plus
+# (optionally) a bank export to try /import_transaction with:
+#
+#   users.json        N users, some with their own custom categories
+#   transactions.csv  username,date,category,amount
+#   import.csv        date,description,amount (merchant descriptions)
+#
+# Everything is drawn from one seed and the dates end on a fixed day
+# (--end, default DEFAULT_END), so the same arguments always give the same
+# files, whatever day they are run.  Rows are generated and written in
+# vectorized NumPy chunks (10M rows take seconds, not minutes):
+#   - a few heavy users and a long tail of light ones (lognormal activity)
+#   - dates spread over the last few years, busier on weekends and in December
+#   - each category has its own share and its own (lognormal) amount range
+#   - merchant names repeat with a Zipf-like skew and store numbers
+#
+#     python generate_data.py                          # 100 users, 100k rows, here
+#     python generate_data.py --users 10000 --rows 10000000 --out-dir /tmp/big
+#     python generate_data.py --import-rows 50000 --seed 7
+
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+CHUNK_ROWS = 1_000_000
+DEFAULT_END = '2025-12-31'  # last date in the data unless --end says otherwise
+
+# category -> (share of transactions, median amount, spread of log amount)
+CATEGORY_PROFILE = {
+    "Groceries": (0.26, 45.0, 0.6),
+    "Food & Dining": (0.24, 18.0, 0.7),
+    "Transportation": (0.16, 22.0, 0.8),
+    "Entertainment": (0.12, 25.0, 0.9),
+    "Bills": (0.10, 95.0, 0.5),
+    "Miscellaneous/Other": (0.12, 30.0, 1.0),
+}
+CUSTOM_CATEGORIES = {
+    "Pets": (35.0, 0.7), "Gym": (40.0, 0.3), "Travel": (180.0, 0.9),
+    "Gifts": (50.0, 0.8), "Kids": (40.0, 0.7), "Coffee": (6.0, 0.4),
+    "Books": (20.0, 0.5), "Health": (60.0, 0.9),
+}
+CUSTOM_SHARE = 0.08   # share of a user's transactions in their custom categories
+MAX_AMOUNT = 5000.00
+
+FIRST_NAMES = ["Alex", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Kai", "Noa", "Leilani", "Sam"]
+LAST_NAMES = ["Kealoha", "Nguyen", "Smith", "Garcia", "Tanaka", "Kim", "Santos", "Lee", "Patel", "Brown", "Silva", "Chen"]
+CREDIT_LIMITS = [500.0, 1000.0, 2500.0, 5000.0, 10000.0]
+
+# merchant names for import.csv (the app's keyword matcher picks the category)
+MERCHANTS = [
+    "SAFEWAY GROCERY", "WALMART SUPERCENTER", "TARGET", "FOODLAND", "COSTCO WHSE",
+    "STARBUCKS", "MCDONALD'S", "PANDA EXPRESS", "LOCAL RESTAURANT", "BLUE CAFE",
+    "UBER TRIP", "LYFT RIDE", "SHELL GAS STATION", "THE BUS", "CHEVRON",
+    "NETFLIX.COM", "HULU", "SPOTIFY", "AMC MOVIE THEATER", "STEAM GAMES",
+    "HAWAIIAN ELECTRIC", "CITY WATER DEPT", "COMCAST INTERNET", "RENT PAYMENT", "VERIZON WIRELESS",
+    "AMAZON MKTP", "APPLE.COM/BILL", "CVS PHARMACY", "ROSS STORES", "PETCO",
+]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic users and transactions.')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=100_000, help='transactions.csv rows')
+    parser.add_argument('--import-rows', type=int, default=0, help='also write import.csv with this many rows')
+    parser.add_argument('--years', type=int, default=3, help='how far back the dates go')
+    parser.add_argument('--end', default=DEFAULT_END, help=f'last date (YYYY-MM-DD, default {DEFAULT_END}; "today" for today)')
+    parser.add_argument('--seed', type=int, default=352)
+    parser.add_argument('--out-dir', default='.')
+    parser.add_argument('--password', default='password', help='password for every generated user')
+    return parser.parse_args(argv)
+
+
+# -------------------------------
+#   USERS
+# -------------------------------
+def make_users(rng, n, password='password'):
+    """{username: record} like register + setup_credit would leave them."""
+    base = list(CATEGORY_PROFILE)
+    customs = list(CUSTOM_CATEGORIES)
+    users = {}
+    for i in range(n):
+        limit = float(rng.choice(CREDIT_LIMITS))
+        n_custom = int(rng.choice([0, 0, 1, 2]))
+        users[f"user{i:05d}"] = {
+            "first_name": str(rng.choice(FIRST_NAMES)),
+            "last_name": str(rng.choice(LAST_NAMES)),
+            "password": password,
+            "credit_limit": limit,
+            "current_balance": round(float(limit * rng.beta(2, 5)), 2),
+            "first_time": False,
+            "categories": base + [str(c) for c in rng.choice(customs, n_custom, replace=False)],
+        }
+    return users
+
+
+# -------------------------------
+#   VECTORIZED PIECES
+# -------------------------------
+def day_weights(days):
+    """Relative activity per calendar day: weekends and December are busier."""
+    weekday = np.array([d.weekday() for d in days])
+    month = np.array([d.month for d in days])
+    weights = np.where(weekday >= 5, 1.3, 1.0)
+    weights = weights * np.where(month == 12, 1.4, 1.0)
+    return weights / weights.sum()
+
+
+def amount_strings(max_cents):
+    """Lookup table: cents -> 'D.CC' (formatting 10M floats one by one is the slow part)."""
+    cents = np.arange(max_cents + 1)
+    dollars = (cents // 100).astype(str).astype(object)
+    rest = np.char.zfill((cents % 100).astype(str), 2).astype(object)
+    return dollars + "." + rest
+
+
+def draw_amounts(rng, medians, spreads):
+    """Lognormal amounts around each row's category median, in whole cents."""
+    amounts = np.exp(np.log(medians) + spreads * rng.standard_normal(len(medians)))
+    return np.clip(np.round(amounts * 100), 1, int(MAX_AMOUNT * 100)).astype(np.int64)
+
+
+def _tables(rng, users, years, end):
+    """Everything the chunk writer indexes into, built once."""
+    names = list(users)
+    # a few heavy users, a long tail of light ones
+    activity = rng.lognormal(0.0, 1.0, len(names))
+    days = [end - timedelta(days=i) for i in range(years * 365, -1, -1)]
+
+    # categories: the base ones first, then every custom one
+    categories = list(CATEGORY_PROFILE) + list(CUSTOM_CATEGORIES)
+    base_p = np.array([p for p, _, _ in CATEGORY_PROFILE.values()])
+
+    # user -> up to two custom category ids (-1 if none)
+    user_custom = np.full((len(names), 2), -1, dtype=np.int64)
+    for uid, name in enumerate(names):
+        extra = users[name]["categories"][len(CATEGORY_PROFILE):]
+        for j, category in enumerate(extra[:2]):
+            user_custom[uid, j] = categories.index(category)
+
+    return {
+        "user_p": activity / activity.sum(),
+        "day_p": day_weights(days),
+        "base_p": base_p / base_p.sum(),
+        "medians": np.array([m for _, m, _ in CATEGORY_PROFILE.values()] + [m for m, _ in CUSTOM_CATEGORIES.values()]),
+        "spreads": np.array([s for _, _, s in CATEGORY_PROFILE.values()] + [s for _, s in CUSTOM_CATEGORIES.values()]),
+        "user_custom": user_custom,
+        # prebuilt strings, separators included, so a line is four lookups
+        "user_str": np.array([n + "," for n in names], dtype=object),
+        "day_str": np.array([d.isoformat() + "," for d in days], dtype=object),
+        "category_str": np.array([c + "," for c in categories], dtype=object),
+        "amount_str": amount_strings(int(MAX_AMOUNT * 100)) + "\n",
+    }
+
+
+def _chunk(tables, rng, n):
+    """(user ids, category ids, cents) for n rows."""
+    uids = rng.choice(len(tables["user_p"]), n, p=tables["user_p"])
+    cids = rng.choice(len(tables["base_p"]), n, p=tables["base_p"])
+
+    # a share of rows go to the user's own categories (if they have any)
+    custom = tables["user_custom"][uids, rng.integers(0, 2, n)]
+    use_custom = (rng.random(n) < CUSTOM_SHARE) & (custom >= 0)
+    cids = np.where(use_custom, custom, cids)
+
+    cents = draw_amounts(rng, tables["medians"][cids], tables["spreads"][cids])
+    return uids, cids, cents
+
+
+def write_transactions(path, users, rows, seed=352, years=3, end=None):
+    """Write `rows` transactions for `users` to path (username,date,category,amount)."""
+    rng = np.random.default_rng(seed)
+    tables = _tables(rng, users, years, end or date.today())
+    # chunks are cut from one date-sorted stream so the whole file is in date order
+    day_ids = np.sort(rng.choice(len(tables["day_p"]), rows, p=tables["day_p"]))
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write("username,date,category,amount\n")
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            uids, cids, cents = _chunk(tables, rng, n)
+            lines = (tables["user_str"][uids] + tables["day_str"][day_ids[start:start + n]]
+                     + tables["category_str"][cids] + tables["amount_str"][cents])
+            f.write("".join(lines.tolist()))
+
+
+def write_import(path, rows, seed=352, years=1, end=None):
+    """A bank export (date,description,amount) with repeating merchant names."""
+    rng = np.random.default_rng(seed + 1)
+    end = end or date.today()
+    days = [end - timedelta(days=i) for i in range(years * 365, -1, -1)]
+    day_p = day_weights(days)
+
+    # Zipf-like: a few merchants show up on most lines
+    merchant_p = 1.0 / np.arange(1, len(MERCHANTS) + 1)
+    merchant_p /= merchant_p.sum()
+    descriptions = np.array([f"{m} #{k}," for m in MERCHANTS for k in range(1, 51)], dtype=object)
+
+    day_str = np.array([d.isoformat() + "," for d in days], dtype=object)
+    amount_str = amount_strings(int(MAX_AMOUNT * 100)) + "\n"
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write("date,description,amount\n")
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            merchant = rng.choice(len(MERCHANTS), n, p=merchant_p)
+            store = rng.integers(0, 50, n)
+            cents = draw_amounts(rng, np.full(n, 30.0), np.full(n, 0.9))
+            lines = (day_str[np.sort(rng.choice(len(days), n, p=day_p))]
+                     + descriptions[merchant * 50 + store] + amount_str[cents])
+            f.write("".join(lines.tolist()))
+
+
+def main():
+    args = parse_args()
+    end = date.today() if args.end == 'today' else date.fromisoformat(args.end)
+    os.makedirs(args.out_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    rng = np.random.default_rng(args.seed)
+    users = make_users(rng, args.users, args.password)
+    with open(os.path.join(args.out_dir, 'users.json'), 'w') as f:
+        json.dump(users, f)
+
+    write_transactions(os.path.join(args.out_dir, 'transactions.csv'), users, args.rows, args.seed, args.years, end)
+    if args.import_rows:
+        write_import(os.path.join(args.out_dir, 'import.csv'), args.import_rows, args.seed, end=end)
+
+    print(f"{args.users:,} users, {args.rows:,} transactions"
+          + (f", {args.import_rows:,} import rows" if args.import_rows else "")
+          + f" in {time.perf_counter() - started:.1f}s -> {os.path.abspath(args.out_dir)}")
+
+
+if __name__ == "__main__":
+    main()
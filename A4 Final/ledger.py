@@ -0,0 +1,1006 @@
+# LEDGER STORAGE FOR THE CREDIT TRACKER (final11.py)
+#
+# transactions.csv stays the source of truth (append-only).  Next to it we keep
+#   - a typed, columnar copy of the ledger (NumPy arrays): user id, date as a
+#     day number, category id and amount per row, plus a per-user list of row
+#     numbers, so a user's rows can be read without touching the CSV or
+#     parsing any strings
+#   - a per-user rollup cube: spending per (year-month, category) cell,
+#     updated in place on every append.  Category, month and season totals
+#     (and the season -> month -> category drill-down) are sums over a few
+#     cells, so the dashboard never has to rescan the ledger
+#   - a per-user date index (row numbers sorted by date, also one per
+#     user + category), so a date range ("last 30 days") or a page of history
+#     is a binary search plus the rows in it
+#
+# The CSV is parsed once when rows enter the columns; everything after that
+# works on typed values.  Old 3-column rows (username,category,amount) are
+# repaired on the way in: they count as undated transactions.
+#
+# The columns and aggregates are saved to ledger_columns.npz / aggregates.json
+# as a checkpoint every CHECKPOINT_SECONDS (and at exit), not on every append:
+# the files hold every user, so rewriting them per write would cost time in
+# proportion to the whole ledger.  Rows appended after the last checkpoint
+# are simply parsed from the CSV tail at the next start.
+#
+#     python ledger.py            # rebuild columns + aggregates from the CSV
+#     python ledger.py --repair   # also rewrite legacy rows in the CSV itself
+
+import atexit
+import bisect
+import csv
+import functools
+import gc
+import io
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+from locks import file_lock
+from metrics import timed_stage
+
+TRANSACTIONS_FILE = 'transactions.csv'
+COLUMNS_FILE = 'ledger_columns.npz'
+AGGREGATES_FILE = 'aggregates.json'
+FIELDNAMES = ['username', 'date', 'category', 'amount']
+
+# how much of the CSV _scan() parses at a time
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+
+# how often (seconds) changed columns/aggregates are written back; 0 = only at exit
+CHECKPOINT_SECONDS = float(os.environ.get('LEDGER_CHECKPOINT_SECONDS', 60))
+
+NO_DATE = np.iinfo(np.int32).min  # date column value for undated rows
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# size   -> how many bytes of the CSV the columns cover
+# header -> field names from the first line of the CSV
+# file   -> [device, inode] of the CSV they were read from; a different one
+#           means the file was replaced (e.g. by --repair), not appended to
+_store = {"size": 0, "header": None, "file": None}
+
+# string tables: id -> name and name -> id
+_usernames = []
+_username_ids = {}
+_category_names = []
+_category_ids = {}
+
+# typed columns (only the first _count entries are used; they grow by doubling)
+_columns = {
+    "user": np.zeros(0, dtype=np.int32),
+    "date": np.zeros(0, dtype=np.int32),      # days since 1970-01-01, or NO_DATE
+    "category": np.zeros(0, dtype=np.int32),
+    "amount": np.zeros(0, dtype=np.float64),  # NaN if the amount did not parse
+}
+_count = 0
+
+# user id -> row numbers of that user's transactions (in file order)
+_user_rows = {}
+
+# user id -> (days, rows): the same rows sorted by (date, row number), with
+# the dates alongside for bisect.  Undated rows (NO_DATE) sort first.
+_user_dates = {}
+# (user id, category id) -> (days, rows), the same thing for one category
+_category_dates = {}
+
+# size   -> how many bytes of the CSV have been folded into the totals
+# file   -> [device, inode] of that CSV (as in _store)
+# schema -> AGGREGATES_SCHEMA (older files are rebuilt)
+# users  -> username -> {"cube": {"YYYY-MM" ("" if undated): {category: total}},
+#                        "order": categories in order of first appearance,
+#                        "version": rows folded so far}
+AGGREGATES_SCHEMA = 2
+_aggregates = {"size": 0, "file": None, "schema": AGGREGATES_SCHEMA, "users": {}}
+_loaded = False
+
+# bumped on every full rebuild so data versions from before it never match
+_generation = 0
+
+# dirty -> the in-memory state is ahead of the saved sidecars
+# pid   -> the process the checkpoint thread was started in (a forked
+#          worker needs its own)
+_checkpoint = {"dirty": False, "pid": None}
+
+# guards all of the in-memory state above (request threads + import workers)
+_lock = threading.RLock()
+# serializes writing the sidecar files (done outside _lock)
+_save_lock = threading.Lock()
+
+
+def _locked(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+# -------------------------------
+#   PARSING HELPERS
+# -------------------------------
+def _parse_line(raw):
+    """Parse one raw CSV line (bytes) into a list of fields."""
+    fields = next(csv.reader([raw.decode('utf-8')]), [])
+    return fields
+
+
+def _split_fields(header, fields):
+    """
+    (username, date, category, amount) strings for one CSV row.
+    Legacy rows have only 3 fields (username,category,amount) and no date.
+    """
+    if len(fields) == 4:
+        return fields
+    if len(fields) == 3:
+        username, category, amount = fields
+        return username, '', category, amount
+    row = dict(zip(header, fields))
+    return row.get('username'), row.get('date') or '', row.get('category'), row.get('amount')
+
+
+def _amount(value):
+    try:
+        amount = float(value)
+    except (ValueError, TypeError):
+        return None
+    return amount if amount == amount else None  # "nan" is no amount either
+
+
+def _day_number(date_str):
+    """Days since 1970-01-01 for a YYYY-MM-DD string, or NO_DATE."""
+    if not date_str:
+        return NO_DATE
+    # fast path: zero-padded ISO dates are sliced instead of going through strptime
+    if len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-':
+        digits = date_str[:4] + date_str[5:7] + date_str[8:]
+        if digits.isascii() and digits.isdigit():
+            try:
+                return date(int(digits[:4]), int(digits[4:6]), int(digits[6:])).toordinal() - EPOCH_ORDINAL
+            except ValueError:
+                return NO_DATE
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").toordinal() - EPOCH_ORDINAL
+    except ValueError:
+        return NO_DATE
+
+
+def day_to_date(day):
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+def season_for_month(month):
+    # Northern hemisphere seasons
+    if month in (12, 1, 2):
+        return "Winter ❄️"
+    if month in (3, 4, 5):
+        return "Spring 🌸"
+    if month in (6, 7, 8):
+        return "Summer ☀️"
+    return "Fall 🍂"
+
+
+SEASONS = ["Winter ❄️", "Spring 🌸", "Summer ☀️", "Fall 🍂"]
+_SEASON_OF_MONTH = np.array([0] + [SEASONS.index(season_for_month(m)) for m in range(1, 13)])
+
+
+def month_numbers(days):
+    """Calendar month (1-12) for an array of day numbers (no NO_DATE)."""
+    return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+
+
+# -------------------------------
+#   TYPED COLUMNS
+# -------------------------------
+def _intern(names, ids, name):
+    if name not in ids:
+        ids[name] = len(names)
+        names.append(name)
+    return ids[name]
+
+
+def _grow(needed):
+    capacity = len(_columns["user"])
+    if needed <= capacity:
+        return
+    capacity = max(needed, capacity * 2, 1024)
+    for key, column in _columns.items():
+        grown = np.zeros(capacity, dtype=column.dtype)
+        grown[:_count] = column[:_count]
+        _columns[key] = grown
+
+
+def _add_row(username, date_str, category, amount_str):
+    """Append one parsed row to the columns.  Returns (uid, day, cid, amount)."""
+    global _count
+    uid = _intern(_usernames, _username_ids, username)
+    cid = _intern(_category_names, _category_ids, category or '')
+    day = _day_number(date_str)
+    amount = _amount(amount_str)
+
+    _grow(_count + 1)
+    _columns["user"][_count] = uid
+    _columns["date"][_count] = day
+    _columns["category"][_count] = cid
+    _columns["amount"][_count] = np.nan if amount is None else amount
+    _user_rows.setdefault(uid, []).append(_count)
+    _index_date(_user_dates, uid, day, _count)
+    _index_date(_category_dates, (uid, cid), day, _count)
+    _count += 1
+    return uid, day, cid, amount
+
+
+def _amount_or_nan(value):
+    amount = _amount(value)
+    return np.nan if amount is None else amount
+
+
+def _parse_block(header, data):
+    """
+    (usernames, date strings, categories, amount strings) for a block of
+    complete CSV lines, parsed by one csv.reader.  Rows without a username
+    are left out.
+    """
+    rows = [fields for fields in csv.reader(io.StringIO(data.decode('utf-8'), newline='')) if fields]
+    if rows and all(len(fields) == 4 and fields[0] for fields in rows):
+        # the usual case: already in order (zip(*rows) is slower than this)
+        return [[fields[i] for fields in rows] for i in range(4)]
+    columns = ([], [], [], [])
+    for fields in rows:
+        values = _split_fields(header, fields)
+        if values[0]:
+            for column, value in zip(columns, values):
+                column.append(value)
+    return columns
+
+
+def _add_rows(users, dates, categories, amounts, index=True):
+    """
+    Append parsed rows to the columns, converting each column once.  With
+    index=False the per-user row lists and date indexes are left for
+    _rebuild_user_rows().  Returns the first new row number.
+    """
+    global _count
+    # ids in order of first appearance, like _add_row() hands them out
+    for name in dict.fromkeys(users):
+        _intern(_usernames, _username_ids, name)
+    for name in dict.fromkeys(categories):
+        _intern(_category_names, _category_ids, name or '')
+    day_of = {date_str: _day_number(date_str) for date_str in dict.fromkeys(dates)}
+
+    n = len(users)
+    first = _count
+    _grow(first + n)
+    new = slice(first, first + n)
+    _columns["user"][new] = [_username_ids[name] for name in users]
+    _columns["date"][new] = [day_of[date_str] for date_str in dates]
+    _columns["category"][new] = [_category_ids[name or ''] for name in categories]
+    try:
+        _columns["amount"][new] = np.array(amounts, dtype=np.float64)
+    except ValueError:  # a blank or garbled amount somewhere in the block
+        _columns["amount"][new] = [_amount_or_nan(value) for value in amounts]
+    _count += n
+
+    if index:
+        for row in range(first, _count):
+            uid, day, cid = int(_columns["user"][row]), int(_columns["date"][row]), int(_columns["category"][row])
+            _user_rows.setdefault(uid, []).append(row)
+            _index_date(_user_dates, uid, day, row)
+            _index_date(_category_dates, (uid, cid), day, row)
+    return first
+
+
+def _index_date(index, key, day, row):
+    """Insert a new row into a date index (O(log n) search)."""
+    days, rows = index.setdefault(key, ([], []))
+    # the new row has the highest row number, so it goes after equal dates;
+    # usually that is the very end (transactions arrive in date order)
+    i = bisect.bisect_right(days, day)
+    days.insert(i, day)
+    rows.insert(i, row)
+
+
+def _rebuild_user_rows():
+    _user_rows.clear()
+    _user_dates.clear()
+    _category_dates.clear()
+    users = _columns["user"][:_count]
+    order = np.argsort(users, kind='stable')
+    bounds = np.flatnonzero(np.diff(users[order])) + 1
+    for rows in np.split(order, bounds):
+        if len(rows):
+            uid = int(users[rows[0]])
+            _user_rows[uid] = rows.tolist()
+            # stable sort keeps file order among rows with the same date
+            by_date = rows[np.argsort(_columns["date"][rows], kind='stable')]
+            _user_dates[uid] = (_columns["date"][by_date].tolist(), by_date.tolist())
+            cats = _columns["category"][by_date]
+            for cid in np.unique(cats):
+                in_category = by_date[cats == cid]
+                _category_dates[(uid, int(cid))] = (_columns["date"][in_category].tolist(), in_category.tolist())
+
+
+def _tmp_name(path):
+    # per process: several workers may rewrite the same sidecar at once
+    return f"{path}.{os.getpid()}.tmp"
+
+
+def _columns_snapshot():
+    """Copies of everything save_columns() writes (call with _lock held)."""
+    return {
+        "user": _columns["user"][:_count].copy(),
+        "date": _columns["date"][:_count].copy(),
+        "category": _columns["category"][:_count].copy(),
+        "amount": _columns["amount"][:_count].copy(),
+        "usernames": np.array(_usernames, dtype=str),
+        "categories": np.array(_category_names, dtype=str),
+        "meta": np.array(json.dumps(_store)),
+    }
+
+
+def _write_columns(snapshot):
+    tmp = _tmp_name(COLUMNS_FILE)
+    with open(tmp, 'wb') as f:
+        np.savez(f, **snapshot)
+    os.replace(tmp, COLUMNS_FILE)
+
+
+def save_columns():
+    with _lock:
+        snapshot = _columns_snapshot()
+    with _save_lock:
+        _write_columns(snapshot)
+
+
+def _load_columns():
+    global _count
+    with np.load(COLUMNS_FILE) as data:
+        for key in _columns:
+            _columns[key] = data[key].copy()
+        _count = len(_columns["user"])
+        _usernames[:] = data["usernames"].tolist()
+        _category_names[:] = data["categories"].tolist()
+        _store.update(json.loads(str(data["meta"])))
+    _username_ids.clear()
+    _username_ids.update({name: i for i, name in enumerate(_usernames)})
+    _category_ids.clear()
+    _category_ids.update({name: i for i, name in enumerate(_category_names)})
+    _rebuild_user_rows()
+
+
+def _reset_columns():
+    global _count
+    _store.update({"size": 0, "header": None, "file": None})
+    _usernames.clear()
+    _username_ids.clear()
+    _category_names.clear()
+    _category_ids.clear()
+    for key, column in _columns.items():
+        _columns[key] = np.zeros(0, dtype=column.dtype)
+    _count = 0
+    _user_rows.clear()
+    _user_dates.clear()
+    _category_dates.clear()
+
+
+# -------------------------------
+#   SPENDING AGGREGATES
+# -------------------------------
+def _empty_totals():
+    return {"cube": {}, "order": [], "version": 0}
+
+
+def _fold(uid, day, cid, amount):
+    """Add one typed transaction into its user's cube cell."""
+    totals = _aggregates["users"].setdefault(_usernames[uid], _empty_totals())
+    totals["version"] = totals.get("version", 0) + 1
+
+    if amount is None:
+        return
+
+    category = _category_names[cid]
+    if category not in totals["order"]:
+        totals["order"].append(category)
+
+    # older rows without a date go in the "" cell (they still count per category)
+    if day == NO_DATE:
+        key = ""
+    else:
+        dt = day_to_date(day)
+        key = f"{dt.year:04d}-{dt.month:02d}"
+    cell = totals["cube"].setdefault(key, {})
+    cell[category] = cell.get(category, 0) + amount
+
+
+def _fold_rows(first):
+    """_fold() every row from row number `first` on."""
+    rows = range(first, _count)
+    for uid, day, cid, amount in zip(_columns["user"][rows].tolist(), _columns["date"][rows].tolist(),
+                                     _columns["category"][rows].tolist(), _columns["amount"][rows].tolist()):
+        _fold(uid, day, cid, None if amount != amount else amount)  # NaN -> None
+
+
+@_locked
+def rebuild_aggregates():
+    """
+    Recompute every user's cube from the typed columns, with one bincount
+    per user.  Cells, categories and sums come out exactly as folding the
+    rows one by one in file order would leave them.
+    """
+    _aggregates.update({"size": _store["size"], "file": _store["file"], "schema": AGGREGATES_SCHEMA, "users": {}})
+    users = _columns["user"][:_count]
+    days = _columns["date"][:_count]
+    cats = _columns["category"][:_count].astype(np.int64)
+    amounts = _columns["amount"][:_count]
+
+    # months since 0000-01 per row (12 or more for any real date), 0 for
+    # undated rows (the "" cell)
+    months = np.zeros(_count, dtype=np.int64)
+    dated = days != NO_DATE
+    months[dated] = days[dated].astype('datetime64[D]').astype('datetime64[M]').astype(np.int64) + 1970 * 12
+    n_cats = max(len(_category_names), 1)
+
+    order = np.argsort(users, kind='stable')
+    for rows in np.split(order, np.flatnonzero(np.diff(users[order])) + 1):
+        if not len(rows):
+            continue
+        totals = _aggregates["users"][_usernames[int(users[rows[0]])]] = _empty_totals()
+        totals["version"] = len(rows)
+        rows = rows[~np.isnan(amounts[rows])]
+        if not len(rows):
+            continue
+
+        present, first = np.unique(cats[rows], return_index=True)
+        totals["order"] = [_category_names[c] for c in present[np.argsort(first)]]
+
+        # one slot per (month, category) cell, visited in order of first appearance
+        cells, first, slots = np.unique(months[rows] * n_cats + cats[rows], return_index=True, return_inverse=True)
+        sums = np.bincount(slots.ravel(), weights=amounts[rows], minlength=len(cells))
+        for k in np.argsort(first, kind='stable'):
+            month, cid = divmod(int(cells[k]), n_cats)
+            key = "" if month == 0 else f"{month // 12:04d}-{month % 12 + 1:02d}"
+            totals["cube"].setdefault(key, {})[_category_names[cid]] = float(sums[k])
+
+
+def save_aggregates():
+    with _lock:
+        text = json.dumps(_aggregates)
+    with _save_lock:
+        _write_text(AGGREGATES_FILE, text)
+
+
+# -------------------------------
+#   CHECKPOINTS
+# -------------------------------
+def checkpoint():
+    """
+    Write the columns and aggregates if they changed since the last save.
+    Only the copying happens under the ledger lock; the files are written
+    after it is released.  Returns True if anything was written.
+    """
+    with _lock:
+        if not _checkpoint["dirty"]:
+            return False
+        columns = _columns_snapshot()
+        aggregates = json.dumps(_aggregates)
+        _checkpoint["dirty"] = False
+    with _save_lock:
+        _write_columns(columns)
+        _write_text(AGGREGATES_FILE, aggregates)
+    return True
+
+
+def _checkpoint_loop():
+    while True:
+        time.sleep(CHECKPOINT_SECONDS)
+        try:
+            checkpoint()
+        except OSError:
+            _checkpoint["dirty"] = True  # try again next round
+
+
+def _mark_dirty():
+    """Note that the sidecars are behind; start the checkpoint thread if needed."""
+    _checkpoint["dirty"] = True
+    if _checkpoint["pid"] != os.getpid() and CHECKPOINT_SECONDS > 0:
+        _checkpoint["pid"] = os.getpid()
+        threading.Thread(target=_checkpoint_loop, name='ledger-checkpoint', daemon=True).start()
+
+
+atexit.register(checkpoint)
+
+
+@_locked
+def user_aggregates(username):
+    """
+    One user's rollup cube:
+        {"cube": {"YYYY-MM" ("" if undated): {category: total}},
+         "order": categories in order of first appearance,
+         "version": rows folded so far}
+    Raises FileNotFoundError if there is no transactions.csv yet.
+    """
+    if not os.path.exists(TRANSACTIONS_FILE):
+        raise FileNotFoundError(TRANSACTIONS_FILE)
+    refresh_index()
+    totals = _aggregates["users"].get(username) or _empty_totals()
+    # a copy, so callers can read it while other threads keep appending
+    return {
+        "cube": {key: dict(cell) for key, cell in totals["cube"].items()},
+        "order": list(totals["order"]),
+        "version": totals["version"],
+    }
+
+
+@_locked
+def data_version(username):
+    """
+    Changes whenever this user's ledger changes (rows appended here or by
+    another process, or a rebuild).  Used as a cache key for derived data.
+    """
+    version = 0
+    if os.path.exists(TRANSACTIONS_FILE):
+        refresh_index()
+        version = (_aggregates["users"].get(username) or {}).get("version", 0)
+    return f"{_generation}.{version}"
+
+
+# -------------------------------
+#   ROLLUPS OVER THE CUBE
+# -------------------------------
+# All of these take user_aggregates() output and only add up cube cells.
+def _cells(totals, season=None, month=None):
+    """(month number or None, {category: total}) for the cells in the filter."""
+    for key, cell in totals["cube"].items():
+        m = int(key[5:7]) if key else None
+        if month is not None and m != month:
+            continue
+        if season is not None and (m is None or season_for_month(m) != season):
+            continue
+        yield m, cell
+
+
+def cube_category_totals(totals, season=None, month=None):
+    """{category: total} (first-appearance order), optionally for one season or calendar month."""
+    sums = {}
+    for _, cell in _cells(totals, season, month):
+        for category, amount in cell.items():
+            sums[category] = sums.get(category, 0) + amount
+    return {category: sums[category] for category in totals["order"] if category in sums}
+
+
+def cube_month_totals(totals, season=None):
+    """{1..12: total} over every year (dated rows only), optionally one season's months."""
+    month_totals = {m: 0.0 for m in range(1, 13)}
+    for m, cell in _cells(totals, season):
+        if m is not None:
+            month_totals[m] += sum(cell.values())
+    return month_totals
+
+
+def cube_season_totals(totals):
+    """{season: total} (dated rows only), in order of first appearance."""
+    season_totals = {}
+    for m, cell in _cells(totals):
+        if m is not None:
+            season = season_for_month(m)
+            season_totals[season] = season_totals.get(season, 0) + sum(cell.values())
+    return season_totals
+
+
+def drill_down(totals, season=None, month=None):
+    """
+    Season -> month -> category:
+        no filter -> {season: total}
+        season    -> {month number: total} for that season's months
+        month     -> {category: total} for that calendar month
+    """
+    if month is not None:
+        return cube_category_totals(totals, month=month)
+    if season is not None:
+        return {m: total for m, total in cube_month_totals(totals, season).items()
+                if season_for_month(m) == season}
+    return cube_season_totals(totals)
+
+
+# -------------------------------
+#   BUILD / REFRESH FROM THE CSV
+# -------------------------------
+@timed_stage("csv_scan")
+def _scan(start):
+    """
+    Parse every row from byte `start` to the end of the CSV into the columns,
+    folding rows the aggregates have not seen yet into the totals.  The file
+    is read in SCAN_BLOCK_BYTES blocks of whole lines, each parsed by one
+    csv.reader and converted a column at a time.  A full scan from an empty
+    state indexes and folds everything in one vectorized pass at the end.
+    """
+    bulk = _count == 0 and _aggregates["size"] == 0
+    first_row = _count
+    # the cyclic GC would otherwise walk every freshly parsed row list again
+    # and again (over half the parse time); none of them form cycles
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+        with open(TRANSACTIONS_FILE, 'rb') as f:
+            f.seek(start)
+            if start == 0:
+                _store["file"] = _aggregates["file"] = _file_id(os.fstat(f.fileno()))
+                first = f.readline()
+                _store["header"] = _parse_line(first) if first.strip() else None
+            header = _store["header"] or FIELDNAMES
+            pos = f.tell()
+            carry = b''
+            for block in iter(lambda: f.read(SCAN_BLOCK_BYTES), b''):
+                data = carry + block
+                cut = data.rfind(b'\n') + 1
+                # anything after the last newline: another process is still writing it
+                data, carry = data[:cut], data[cut:]
+                if not data:
+                    continue
+                # rows before the aggregates' size are already in the totals
+                seen = min(max(_aggregates["size"] - pos, 0), len(data))
+                if seen:
+                    _add_rows(*_parse_block(header, data[:seen]), index=not bulk)
+                if seen < len(data):
+                    new = _add_rows(*_parse_block(header, data[seen:]), index=not bulk)
+                    if not bulk:
+                        _fold_rows(new)
+                pos += len(data)
+        _store["size"] = pos
+        _aggregates["size"] = max(_aggregates["size"], pos)
+        if bulk:
+            _rebuild_user_rows()
+            rebuild_aggregates()
+    finally:
+        if collecting:
+            gc.enable()
+    return _count - first_row
+
+
+def _file_id(st):
+    """Identity of a file (from os.stat/fstat) that survives appends but not a replace."""
+    return [st.st_dev, st.st_ino]
+
+
+def _write_text(path, text):
+    tmp = _tmp_name(path)
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+@_locked
+def build_index():
+    """Rebuild the typed columns and the aggregates from the raw CSV."""
+    global _loaded, _generation
+    _generation += 1
+    _reset_columns()
+    _aggregates.update({"size": 0, "file": None, "schema": AGGREGATES_SCHEMA, "users": {}})
+    _loaded = True
+    found = 0
+    if os.path.exists(TRANSACTIONS_FILE):
+        found = _scan(0)
+    save_columns()
+    save_aggregates()
+    _checkpoint["dirty"] = False
+    return found
+
+
+def _load_index():
+    global _loaded
+    try:
+        _load_columns()
+        with open(AGGREGATES_FILE) as f:
+            saved = json.load(f)
+        _aggregates.update(saved)
+        _loaded = True
+    except (FileNotFoundError, ValueError, KeyError, OSError):
+        build_index()
+        return
+    if (saved.get("schema") != AGGREGATES_SCHEMA or saved.get("file") != _store["file"]
+            or _aggregates["size"] < _store["size"]):
+        # aggregates are from an older layout, another CSV or behind the columns - recompute them
+        rebuild_aggregates()
+        save_aggregates()
+
+
+@_locked
+def refresh_index():
+    """
+    Make sure the columns and aggregates cover the whole CSV.  Only the tail
+    that was appended since the last check gets parsed (e.g. rows written by
+    another process).
+    """
+    if not _loaded:
+        _load_index()
+    try:
+        st = os.stat(TRANSACTIONS_FILE)
+    except FileNotFoundError:
+        if _store["size"] or _aggregates["size"]:
+            build_index()
+        return
+    size = st.st_size
+    replaced = _store["size"] and _file_id(st) != _store["file"]
+    if replaced or size < max(_store["size"], _aggregates["size"]):
+        build_index()  # file was replaced (it may even have grown) or truncated
+    elif size > _store["size"]:
+        if _scan(_store["size"]):
+            _mark_dirty()  # saved by the next checkpoint, not on the read path
+
+
+# -------------------------------
+#   READ A SINGLE USER'S ROWS
+# -------------------------------
+def date_to_day(value):
+    """Day number for a datetime.date."""
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def _date_range_rows(uid, start, end):
+    """Row numbers dated start..end (inclusive, either may be None), by binary search."""
+    days, rows = _user_dates.get(uid, ([], []))
+    lo = bisect.bisect_left(days, date_to_day(start)) if start else bisect.bisect_right(days, NO_DATE)
+    hi = bisect.bisect_right(days, date_to_day(end)) if end else len(days)
+    return rows[lo:hi]
+
+
+@_locked
+def user_columns(username, start=None, end=None):
+    """
+    This user's transactions as typed arrays (file order):
+        {"date": day numbers (NO_DATE if undated), "category": category ids,
+         "amount": floats (NaN if unparseable), "categories": id -> name}
+    With start and/or end (datetime.date, inclusive) only the rows dated in
+    that range, looked up in the date index: O(log n + k) for k rows.
+    Raises FileNotFoundError if there is no transactions.csv yet.
+    """
+    if not os.path.exists(TRANSACTIONS_FILE):
+        raise FileNotFoundError(TRANSACTIONS_FILE)
+    refresh_index()
+    uid = _username_ids.get(username)
+    if start is None and end is None:
+        rows = np.array(_user_rows.get(uid, []), dtype=np.int64)
+    else:
+        rows = np.sort(np.array(_date_range_rows(uid, start, end), dtype=np.int64))
+    return {
+        "date": _columns["date"][rows],
+        "category": _columns["category"][rows],
+        "amount": _columns["amount"][rows],
+        "categories": _category_names,
+    }
+
+
+def category_totals(username, start=None, end=None):
+    """
+    One user's spending per category ({category: total}, in order of first
+    appearance) for rows dated start..end.  Rows without an amount are
+    skipped.  Raises FileNotFoundError if there is no transactions.csv yet.
+    """
+    cols = user_columns(username, start, end)
+    keep = ~np.isnan(cols["amount"])
+    cats = cols["category"][keep]
+    by_category = np.bincount(cats, weights=cols["amount"][keep], minlength=len(cols["categories"]))
+    present, first = np.unique(cats, return_index=True)
+    return {cols["categories"][c]: float(by_category[c]) for c in present[np.argsort(first)]}
+
+
+def month_season_totals(username, start=None, end=None):
+    """
+    One user's spending by calendar month and by season, bucketed with
+    np.bincount over the stored day numbers (no per-row date parsing):
+        ({1..12: total}, {season: total, in order of first appearance})
+    Rows without a date or amount are skipped; start/end (datetime.date,
+    inclusive) limit it to a date range.  Sums run in file order, so the
+    totals are exactly what adding the rows up one by one gives.
+    Raises FileNotFoundError if there is no transactions.csv yet.
+    """
+    cols = user_columns(username, start, end)
+    keep = (cols["date"] != NO_DATE) & ~np.isnan(cols["amount"])
+    amounts = cols["amount"][keep]
+    months = month_numbers(cols["date"][keep])
+
+    by_month = np.bincount(months, weights=amounts, minlength=13)
+    month_totals = {m: float(by_month[m]) for m in range(1, 13)}
+
+    seasons = _SEASON_OF_MONTH[months]
+    by_season = np.bincount(seasons, weights=amounts, minlength=len(SEASONS))
+    present, first = np.unique(seasons, return_index=True)
+    season_totals = {SEASONS[s]: float(by_season[s]) for s in present[np.argsort(first)]}
+    return month_totals, season_totals
+
+
+def year_month_totals(username, start=None, end=None):
+    """
+    One user's spending per year-month ({"YYYY-MM": total}, oldest first)
+    for rows dated start..end, the same series the cube gives for all time.
+    Raises FileNotFoundError if there is no transactions.csv yet.
+    """
+    cols = user_columns(username, start, end)
+    keep = (cols["date"] != NO_DATE) & ~np.isnan(cols["amount"])
+    months = cols["date"][keep].astype('datetime64[D]').astype('datetime64[M]')
+    present, slots = np.unique(months, return_inverse=True)
+    totals = np.bincount(slots, weights=cols["amount"][keep], minlength=len(present))
+    return {str(month): float(total) for month, total in zip(present, totals)}
+
+
+@_locked
+def history_page(username, before=None, category=None, limit=25):
+    """
+    One page of a user's transactions, newest first, using keyset pagination
+    on (day, row number): `before` is the key of the last row of the previous
+    page (None for the first page), so every page is a binary search plus
+    `limit` rows no matter how deep it is.  With `category`, the same walk
+    over that category's own date index.
+    Returns (rows, next key or None); rows are dicts like user_rows() gives,
+    plus 'key'.  Raises FileNotFoundError if there is no transactions.csv yet.
+    """
+    if not os.path.exists(TRANSACTIONS_FILE):
+        raise FileNotFoundError(TRANSACTIONS_FILE)
+    refresh_index()
+    uid = _username_ids.get(username)
+    if category is None:
+        days, rows = _user_dates.get(uid, ([], []))
+    else:
+        days, rows = _category_dates.get((uid, _category_ids.get(category)), ([], []))
+
+    end = len(days)
+    if before is not None:
+        day, row = before
+        # rows with the same day are in row order, so search them by row
+        lo, hi = bisect.bisect_left(days, day), bisect.bisect_right(days, day)
+        end = bisect.bisect_left(rows, row, lo, hi)
+    start = max(end - limit, 0)
+
+    page = []
+    for i in range(end - 1, start - 1, -1):
+        day, row = days[i], rows[i]
+        amount = float(_columns["amount"][row])
+        page.append({
+            'username': username,
+            'date': None if day == NO_DATE else day_to_date(day).isoformat(),
+            'category': _category_names[_columns["category"][row]],
+            'amount': None if amount != amount else amount,
+            'key': (day, row),
+        })
+    return page, (page[-1]['key'] if page and start > 0 else None)
+
+
+def user_rows(username):
+    """
+    Yield this user's transactions as dicts
+    ({'username', 'date' (YYYY-MM-DD or None), 'category', 'amount' (float or None)}).
+    Raises FileNotFoundError if there is no transactions.csv yet.
+    """
+    cols = user_columns(username)
+    for day, cid, amount in zip(cols["date"].tolist(), cols["category"].tolist(), cols["amount"].tolist()):
+        yield {
+            'username': username,
+            'date': None if day == NO_DATE else day_to_date(day).isoformat(),
+            'category': cols["categories"][cid],
+            'amount': None if amount != amount else amount,
+        }
+
+
+# -------------------------------
+#   APPEND NEW ROWS
+# -------------------------------
+@_locked
+def append_transactions(rows):
+    """
+    Append rows ({'username','date','category','amount'}) to the CSV, add them
+    to the typed columns and fold them into the aggregates (saved by the next
+    checkpoint).  Returns how many rows were written.  The CSV is locked
+    while writing so appends from several processes never interleave.
+    """
+    while True:
+        with open(TRANSACTIONS_FILE, 'ab') as f, file_lock(f):
+            if _file_id(os.fstat(f.fileno())) == _file_id(os.stat(TRANSACTIONS_FILE)):
+                pos, count = _append_locked(f, rows)
+                break
+            # the file was replaced while we waited for the lock: reopen
+    _store["size"] = pos
+    _aggregates["size"] = pos
+    if count:
+        _mark_dirty()
+    return count
+
+
+def _append_locked(f, rows):
+    """append_transactions() with the current CSV open and locked: (end offset, rows written)."""
+    count = 0
+    _end_last_line(f)
+    # pick up rows other processes appended before ours (and a row just ended)
+    refresh_index()
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    if pos == 0:
+        header = _encode_row(FIELDNAMES)
+        f.write(header)
+        _store["header"] = list(FIELDNAMES)
+        _store["file"] = _aggregates["file"] = _file_id(os.fstat(f.fileno()))
+        pos += len(header)
+    for row in rows:
+        values = [row.get(k, '') for k in FIELDNAMES]
+        line = _encode_row(values)
+        f.write(line)
+        _fold(*_add_row(*[str(v) for v in values]))
+        pos += len(line)
+        count += 1
+    f.flush()  # before the lock is released, or another writer could skip past us
+    return pos, count
+
+
+def _end_last_line(f):
+    """
+    Give the CSV's last line its newline if it has none (a hand-edited or
+    legacy file).  Only safe with the CSV lock held: then nobody can be in
+    the middle of writing that line, so it is complete, not a partial write.
+    """
+    size = os.fstat(f.fileno()).st_size
+    if not size:
+        return
+    with open(TRANSACTIONS_FILE, 'rb') as tail:
+        tail.seek(size - 1)
+        last = tail.read(1)
+    if last != b'\n':
+        f.write(b'\n')
+        f.flush()
+
+
+def append_transaction(username, date, category, amount):
+    return append_transactions([{
+        'username': username,
+        'date': date,
+        'category': category,
+        'amount': amount
+    }])
+
+
+def _encode_row(values):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue().encode('utf-8')
+
+
+# -------------------------------
+#   MIGRATION: REPAIR LEGACY ROWS
+# -------------------------------
+@_locked
+def repair_legacy_rows():
+    """
+    Rewrite transactions.csv so every row has the 4-column layout (legacy
+    username,category,amount rows get an empty date).  Written to a temp file
+    and swapped in atomically, holding the CSV lock so no append lands in the
+    old file meanwhile (running workers see the new inode and rebuild).
+    Returns how many rows were repaired.
+    """
+    if not os.path.exists(TRANSACTIONS_FILE):
+        return 0
+    repaired = 0
+    tmp = _tmp_name(TRANSACTIONS_FILE)
+    with open(TRANSACTIONS_FILE, newline='', encoding='utf-8') as src, file_lock(src), \
+            open(tmp, 'w', newline='', encoding='utf-8') as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        header = next(reader, None) or FIELDNAMES
+        writer.writerow(FIELDNAMES)
+        for fields in reader:
+            if not fields:
+                continue
+            if len(fields) != 4:
+                repaired += 1
+            writer.writerow(_split_fields(header, fields))
+        dst.flush()
+        os.replace(tmp, TRANSACTIONS_FILE)
+    return repaired
+
+
+if __name__ == "__main__":
+    if '--repair' in sys.argv:
+        print(f"Repaired {repair_legacy_rows()} legacy row(s) in {TRANSACTIONS_FILE}")
+    rows = build_index()
+    print(f"Loaded {rows} row(s) for {len(_usernames)} user(s) -> {COLUMNS_FILE}, {AGGREGATES_FILE}")
@@ -0,0 +1,97 @@
+# LOCKING FOR THE CREDIT TRACKER (final11.py)
+#
+# user_lock(username) serializes changes to one user's balance/ledger while
+# letting different users write at the same time.  Usernames hash onto
+# LOCK_STRIPES stripes; each stripe is a threading lock (threads in this
+# process) plus an fcntl byte-range lock on users.lock (other processes,
+# e.g. preforked workers).
+#
+# file_lock(f) takes an exclusive fcntl lock on an open file, for appends to
+# shared files like transactions.csv and users.journal.
+#
+# Without fcntl (Windows) only the in-process locks are used.
+
+import errno
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LOCK_STRIPES = 64
+LOCK_FILE = 'users.lock'
+
+_thread_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+_held = threading.local()  # stripe -> how many times this thread holds it
+
+_lock_fd = None
+_lock_pid = None
+_fd_lock = threading.Lock()
+
+
+def stripe_for(username):
+    return zlib.crc32(username.encode('utf-8')) % LOCK_STRIPES
+
+
+def _lock_stripe(stripe):
+    """
+    fcntl deadlock detection works per process, so threads of two workers
+    waiting on different stripes can look like a cycle (EDEADLK).  There is
+    no real cycle (each thread holds at most one stripe), so just retry.
+    """
+    while True:
+        try:
+            fcntl.lockf(_lock_file_fd(), fcntl.LOCK_EX, 1, stripe)
+            return
+        except OSError as e:
+            if e.errno != errno.EDEADLK:
+                raise
+            time.sleep(0.001)
+
+
+def _lock_file_fd():
+    """One descriptor per process (fcntl locks belong to the process)."""
+    global _lock_fd, _lock_pid
+    with _fd_lock:
+        if _lock_fd is None or _lock_pid != os.getpid():
+            _lock_fd = os.open(LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+            _lock_pid = os.getpid()
+        return _lock_fd
+
+
+@contextmanager
+def user_lock(username):
+    stripe = stripe_for(username)
+    with _thread_locks[stripe]:
+        depth = getattr(_held, 'depth', None)
+        if depth is None:
+            depth = _held.depth = {}
+
+        # only the outermost hold takes the process-wide lock
+        outermost = depth.get(stripe, 0) == 0
+        if outermost and fcntl:
+            _lock_stripe(stripe)
+        depth[stripe] = depth.get(stripe, 0) + 1
+        try:
+            yield
+        finally:
+            depth[stripe] -= 1
+            if outermost and fcntl:
+                fcntl.lockf(_lock_file_fd(), fcntl.LOCK_UN, 1, stripe)
+
+
+@contextmanager
+def file_lock(f):
+    """Exclusive lock on an open file for the duration of the block."""
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
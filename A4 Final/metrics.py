@@ -0,0 +1,129 @@
+# REQUEST + STAGE METRICS FOR THE CREDIT TRACKER (final11.py)
+#
+# In-process histograms and counters, exposed by /metrics in Prometheus text
+# format:
+#
+#   http_requests_total{endpoint,method,status}        counter
+#   http_request_duration_seconds{endpoint}            histogram
+#   http_response_size_bytes{endpoint}                 histogram
+#   app_stage_duration_seconds{stage}                  histogram
+#       stage = csv_scan (ledger.py reading transactions.csv)
+#               categorize (categorizer.py)
+#               chart_render (charts.py drawing with matplotlib)
+#
+# Recording a value is a bisect plus a few additions under one lock, so it
+# can stay on in production.  With several worker processes each one keeps
+# (and reports) its own numbers, like any per-process Prometheus client.
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# name -> (help text, type, buckets or None)
+METRICS = {
+    "http_requests_total": ("Requests handled, by endpoint, method and status.", "counter", None),
+    "http_request_duration_seconds": ("Time from before_request to after_request.", "histogram", LATENCY_BUCKETS),
+    "http_response_size_bytes": ("Response body size.", "histogram", SIZE_BUCKETS),
+    "app_stage_duration_seconds": ("Time spent in CSV scanning, categorization and chart rendering.", "histogram", LATENCY_BUCKETS),
+}
+
+# (name, labels) -> count (counters) or [per-bucket counts..., +Inf count, sum] (histograms)
+_values = {}
+_lock = threading.Lock()
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(name, **labels):
+    key = (name, _labels(**labels))
+    with _lock:
+        _values[key] = _values.get(key, 0) + 1
+
+
+def observe(name, value, **labels):
+    buckets = METRICS[name][2]
+    key = (name, _labels(**labels))
+    i = bisect.bisect_left(buckets, value)  # first bucket with le >= value
+    with _lock:
+        row = _values.get(key)
+        if row is None:
+            row = _values[key] = [0] * (len(buckets) + 2)
+        row[i] += 1
+        row[-1] += value
+
+
+def record_request(endpoint, method, status, seconds, size):
+    inc("http_requests_total", endpoint=endpoint, method=method, status=str(status))
+    observe("http_request_duration_seconds", seconds, endpoint=endpoint)
+    if size is not None:
+        observe("http_response_size_bytes", size, endpoint=endpoint)
+
+
+@contextmanager
+def stage(name):
+    """Time a block as app_stage_duration_seconds{stage=name}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("app_stage_duration_seconds", time.perf_counter() - start, stage=name)
+
+
+def timed_stage(name):
+    """Decorator form of stage()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Everything recorded so far, in Prometheus text exposition format."""
+    with _lock:
+        snapshot = {key: list(value) if isinstance(value, list) else value for key, value in _values.items()}
+
+    lines = []
+    for name, (help_text, kind, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in snapshot.items() if metric == name)
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for le, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', _number(float(le)))])} {cumulative}")
+            cumulative += value[len(buckets)]
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _values.clear()
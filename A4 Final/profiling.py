@@ -0,0 +1,95 @@
+# ON-DEMAND REQUEST PROFILING FOR THE CREDIT TRACKER (final11.py)
+#
+# Off unless PROFILE_REQUESTS=1 is set.  Then an admin (a username listed in
+# PROFILE_ADMINS, comma separated) can add "X-Profile: 1" or "?profile=1" to
+# a request and it runs under cProfile.  Each profiled request leaves two
+# files in PROFILE_DIR:
+#
+#   <time>-<endpoint>-<id>.prof   raw stats (snakeviz, pstats, ...)
+#   <time>-<endpoint>-<id>.txt    top PROFILE_TOP_N functions by cumulative time
+#
+# Only the newest PROFILE_KEEP profiles are kept.  One request is profiled at
+# a time (cProfile is one profiler per process); others just run normally.
+# Work handed to other threads (chart renders, imports) shows up as the time
+# the request spent waiting for it.
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', 30))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+
+_busy = threading.Lock()
+
+
+def enabled():
+    return os.environ.get('PROFILE_REQUESTS') == '1'
+
+
+def is_admin(username):
+    admins = {name.strip() for name in os.environ.get('PROFILE_ADMINS', '').split(',')}
+    return bool(username) and username in admins
+
+
+def wanted(request, username):
+    """True if this request asked to be profiled and is allowed to be."""
+    if not enabled() or not is_admin(username):
+        return False
+    return request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+
+
+def start():
+    """A running profiler, or None if another request is being profiled."""
+    if not _busy.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiler (e.g. a debugger) is active
+        _busy.release()
+        return None
+    return profiler
+
+
+def stop(profiler):
+    profiler.disable()
+    _busy.release()
+
+
+def save(profiler, endpoint, seconds):
+    """Write the .prof + summary files, prune old ones.  Returns the profile id."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{uuid.uuid4().hex[:8]}"
+    base = os.path.join(PROFILE_DIR, profile_id)
+
+    profiler.dump_stats(base + '.prof')
+    summary = io.StringIO()
+    summary.write(f"{endpoint}: {seconds * 1000:.1f} ms\n\n")
+    pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(PROFILE_TOP_N)
+    with open(base + '.txt', 'w') as f:
+        f.write(summary.getvalue())
+
+    prune()
+    return profile_id
+
+
+def prune(keep=None):
+    """Delete all but the newest `keep` profiles (both files)."""
+    keep = PROFILE_KEEP if keep is None else keep
+    try:
+        names = [n for n in os.listdir(PROFILE_DIR) if n.endswith('.prof')]
+    except FileNotFoundError:
+        return
+    names.sort(key=lambda n: os.path.getmtime(os.path.join(PROFILE_DIR, n)), reverse=True)
+    for name in names[keep:]:
+        for path in (name, name[:-len('.prof')] + '.txt'):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, path))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,119 @@
+# STRESS TEST: no lost balance updates under concurrent writers
+#
+# Runs in a scratch directory with synthetic users.  Several threads per user
+# hammer /add_transaction and /update_balance at the same time through the
+# Flask test client, then the script checks that every user's balance (in
+# memory and reloaded from disk) and ledger row count add up exactly.  With
+# more than one process the app is forked after import, like a preforking
+# server, so the workers only agree through the files on disk.
+#
+#     python stress_locks.py                 # 8 users x 4 threads x 50 rounds
+#     python stress_locks.py 16 8 100
+#     python stress_locks.py 8 4 50 3        # ... in 3 worker processes
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+THREADS_PER_USER = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+ROUNDS = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+PROCESSES = int(sys.argv[4]) if len(sys.argv) > 4 else 1
+
+CHARGE = 1.25
+PAYMENT = 0.25
+START_BALANCE = 100.0
+
+
+def make_users():
+    return {
+        f"user{i}": {
+            "first_name": "Stress",
+            "last_name": f"User{i}",
+            "password": "pw",
+            "credit_limit": 1000000.0,
+            "current_balance": START_BALANCE,
+            "first_time": False,
+            "categories": ["Groceries", "Bills"]
+        }
+        for i in range(USERS)
+    }
+
+
+def worker(app, username, errors):
+    client = app.test_client()
+    client.post('/login', data={'username': username, 'password': 'pw'})
+    for _ in range(ROUNDS):
+        r1 = client.post('/add_transaction', data={'category': 'Groceries', 'amount': str(CHARGE)})
+        r2 = client.post('/update_balance', data={'payment_amount': str(PAYMENT)})
+        if r1.status_code != 302 or r2.status_code != 302:
+            errors.append((username, r1.status_code, r2.status_code))
+
+
+def run_threads(app, usernames, errors):
+    threads = [
+        threading.Thread(target=worker, args=(app, username, errors))
+        for username in usernames
+        for _ in range(THREADS_PER_USER)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def main():
+    workdir = tempfile.mkdtemp(prefix='stress-locks-')
+    here = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, here)
+    os.chdir(workdir)
+    try:
+        with open('users.json', 'w') as f:
+            json.dump(make_users(), f)
+
+        import final11
+        import ledger
+        from user_store import load_users
+
+        errors = []
+        children = []
+        for _ in range(PROCESSES - 1):
+            pid = os.fork()
+            if pid == 0:
+                run_threads(final11.app, list(final11.users), errors)
+                os._exit(1 if errors else 0)
+            children.append(pid)
+        run_threads(final11.app, list(final11.users), errors)
+        for pid in children:
+            _, status = os.waitpid(pid, 0)
+            if status != 0:
+                errors.append(("worker process", pid, status))
+        final11.sync_user_state()
+
+        per_user = THREADS_PER_USER * ROUNDS * PROCESSES
+        expected = round(START_BALANCE + per_user * (CHARGE - PAYMENT), 2)
+        on_disk = load_users()
+        failures = list(errors)
+
+        for username, user in final11.users.items():
+            rows = sum(1 for _ in ledger.user_rows(username))
+            balances = (round(user["current_balance"], 2), round(on_disk[username]["current_balance"], 2))
+            if balances != (expected, expected) or rows != per_user:
+                failures.append((username, balances, rows))
+
+        print(f"users: {USERS}, threads/user: {THREADS_PER_USER}, rounds: {ROUNDS}, processes: {PROCESSES}")
+        print(f"expected balance {expected:.2f} and {per_user} ledger rows per user")
+        if failures:
+            print(f"FAILED: {failures[:10]}")
+            sys.exit(1)
+        print("OK: no lost balance updates")
+    finally:
+        os.chdir(here)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# USER STORAGE FOR THE CREDIT TRACKER (final11.py)
+#
+# users.json is a snapshot.  Every change to a single user is appended to
+# users.journal as one JSON line holding that user's full record, so a
+# balance update costs the same no matter how many users there are.  Every
+# COMPACT_EVERY journal entries the snapshot is rewritten (temp file + atomic
+# rename) and the journal starts over.  load_users() replays the journal on
+# top of the snapshot.  Journal writes and compaction hold a lock (threads
+# and, through fcntl, other processes).
+#
+# Several worker processes can share these files.  Each one keeps its users
+# in memory and calls sync_users() once per request: two os.stat calls tell
+# whether anything changed, new journal lines are applied to just the users
+# they name, and only a compaction by another worker (new snapshot inode)
+# triggers a reload of the snapshot.  Read-check-write changes go through
+# locked_user(), which syncs after taking the user's lock and keeps syncs
+# from other threads off that user until the change is saved.
+#
+# Lock order: the journal's file lock first, then _lock (which only guards
+# the in-memory state and is never held across a stat check or an fsync).
+
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from locks import file_lock, user_lock
+
+USER_FILE = 'users.json'
+JOURNAL_FILE = 'users.journal'
+COMPACT_EVERY = 500
+
+_journal_entries = 0
+_journal_pos = 0      # bytes of the journal already applied in this process
+_snapshot_id = None   # (inode, mtime, size) of the users.json we loaded
+_pinned = {}          # username -> threads of this process changing it
+_lock = threading.RLock()
+
+
+def _read_snapshot():
+    try:
+        with open(USER_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        # empty file (fresh checkout) - nothing saved yet
+        if os.path.getsize(USER_FILE) == 0:
+            return {}
+        raise
+
+
+def _snapshot_stat():
+    try:
+        st = os.stat(USER_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _journal_size():
+    try:
+        return os.path.getsize(JOURNAL_FILE)
+    except FileNotFoundError:
+        return 0
+
+
+def _set_user(users, username, record):
+    """Apply one user's record in place (existing dicts stay the same object)."""
+    if username in _pinned:
+        return  # being changed here under its lock; nobody else can touch it
+    if record is None:
+        users.pop(username, None)
+    elif username in users:
+        if users[username] != record:
+            users[username].clear()
+            users[username].update(record)
+    else:
+        users[username] = record
+
+
+def _replay_journal(users, start=0):
+    """
+    Apply journal entries from byte `start` on.  Stops at a line that is not
+    finished yet (a crash or another process mid-write).  Returns
+    (entries applied, byte position reached).
+    """
+    count = 0
+    pos = start
+    try:
+        with open(JOURNAL_FILE, 'rb') as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                _set_user(users, entry["username"], entry.get("user"))
+                pos += len(line)
+                count += 1
+    except FileNotFoundError:
+        pass
+    return count, pos
+
+
+def load_users():
+    global _journal_entries, _journal_pos, _snapshot_id
+    with _lock:
+        _snapshot_id = _snapshot_stat()
+        users = _read_snapshot()
+        _journal_entries, _journal_pos = _replay_journal(users)
+        return users
+
+
+def _catch_up(users):
+    """Apply what other processes saved.  Call with the journal locked."""
+    global _journal_entries, _journal_pos, _snapshot_id
+    if _snapshot_stat() == _snapshot_id:
+        count, _journal_pos = _replay_journal(users, _journal_pos)
+        _journal_entries += count
+        return
+
+    # another process compacted: reload the snapshot, touch only changed users
+    _snapshot_id = _snapshot_stat()
+    fresh = _read_snapshot()
+    _journal_entries, _journal_pos = _replay_journal(fresh)
+    for username in [u for u in users if u not in fresh]:
+        _set_user(users, username, None)
+    for username, record in fresh.items():
+        _set_user(users, username, record)
+
+
+def sync_users(users):
+    """
+    Bring `users` up to date with changes other processes saved.  Cheap when
+    nothing changed (two stat calls, no locks).
+    """
+    # journal first: a compaction replaces the snapshot before truncating
+    if _journal_size() == _journal_pos and _snapshot_stat() == _snapshot_id:
+        return
+    with open(JOURNAL_FILE, 'a') as journal, file_lock(journal), _lock:
+        _catch_up(users)
+
+
+@contextmanager
+def locked_user(users, username):
+    """Hold the user's lock with their record current, for read-check-write."""
+    with user_lock(username):
+        sync_users(users)
+        with _lock:
+            _pinned[username] = _pinned.get(username, 0) + 1
+        try:
+            yield
+        finally:
+            with _lock:
+                _pinned[username] -= 1
+                if not _pinned[username]:
+                    del _pinned[username]
+
+
+def save_users(users):
+    """Write a full snapshot atomically and clear the journal (compaction)."""
+    global _journal_entries, _journal_pos, _snapshot_id
+    with open(JOURNAL_FILE, 'a') as journal, file_lock(journal), _lock:
+        # include anything other processes saved since our last sync
+        _catch_up(users)
+
+        tmp = USER_FILE + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(users, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, USER_FILE)
+
+        # the snapshot now has everything the journal had
+        journal.truncate(0)
+        _journal_entries = 0
+        _journal_pos = 0
+        _snapshot_id = _snapshot_stat()
+
+
+def save_user(users, username):
+    """Record one user's change in the journal (compacting when it gets long)."""
+    global _journal_entries, _journal_pos
+    with _lock:
+        line = json.dumps({"username": username, "user": users.get(username)})
+    with open(JOURNAL_FILE, 'a') as f, file_lock(f):
+        with _lock:
+            # catch up on other processes' entries so our position stays right
+            _catch_up(users)
+            _set_user(users, username, json.loads(line)["user"])  # ours wins
+
+            f.write(line + '\n')
+            f.flush()
+            _journal_pos = f.tell()
+            _journal_entries += 1
+            compact = _journal_entries >= COMPACT_EVERY
+        # durable before the file lock goes; the lock (not _lock) orders appends
+        os.fsync(f.fileno())
+
+    if compact:
+        save_users(users)